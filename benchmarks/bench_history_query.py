@@ -0,0 +1,82 @@
+"""
+Compares reading a user's whole chat history with reading only its tail.
+
+Usage:
+    $ python3 benchmarks/bench_history_query.py [--limit 10] [--repeat 50]
+
+Recent messages are measured twice: read from SQLite, with the in-memory
+history cache invalidated before every read, and served by the cache.
+
+The benchmark works in a temporary directory, so no real chat history is touched.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_PATH)
+
+HISTORY_SIZES = [100, 1_000, 10_000, 100_000]
+
+
+def _fill_history(chat_database, user_id: int, username: str, rows: int):
+    """
+    Bulk-inserts synthetic messages until the user's history holds `rows` rows.
+    """
+    db_path = chat_database._get_chat_db_path(user_id, username)
+    with chat_database._pool.connection(db_path, chat_database._MESSAGES_SCHEMA) as conn:
+        current = conn.execute("SELECT COUNT(*) FROM messages WHERE user_id = ?", (user_id,)).fetchone()[0]
+        conn.executemany(
+            "INSERT INTO messages (user_id, username, sender, message) VALUES (?, ?, ?, ?)",
+            (
+                (user_id, username, "user" if i % 2 == 0 else "bot", f"Synthetic message number {i}. " * 8)
+                for i in range(current, rows)
+            )
+        )
+
+
+def _measure(func, repeat: int) -> float:
+    """
+    Returns the mean latency of `func` in milliseconds.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=10, help="Number of recent messages to read")
+    parser.add_argument("--repeat", type=int, default=50, help="Number of reads per measurement")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        from databases import chat_database
+
+        user_id, username = 1, "benchmark"
+        cache = chat_database.history_cache
+
+        def load_recent_uncached():
+            cache.invalidate(user_id)
+            chat_database.load_recent_messages(user_id, username, args.limit)
+
+        print(f"{'rows':>8} | {'load_messages (ms)':>20} | {'recent, SQLite (ms)':>20} | {'recent, cached (ms)':>20}")
+        for rows in HISTORY_SIZES:
+            # Rows are inserted behind the history cache's back, so drop its stale entry
+            _fill_history(chat_database, user_id, username, rows)
+            cache.invalidate(user_id)
+
+            full = _measure(lambda: chat_database.load_messages(user_id, username), max(1, args.repeat // 10))
+            recent = _measure(load_recent_uncached, args.repeat)
+            chat_database.load_recent_messages(user_id, username, args.limit)
+            cached = _measure(lambda: chat_database.load_recent_messages(user_id, username, args.limit), args.repeat)
+            print(f"{rows:>8} | {full:>20.3f} | {recent:>20.3f} | {cached:>20.3f}")
+        chat_database.close_connections()
+
+
+if __name__ == "__main__":
+    main()
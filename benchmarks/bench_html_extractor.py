@@ -0,0 +1,108 @@
+"""
+Compares the incremental paragraph extractor with the BeautifulSoup path.
+
+Usage:
+    $ python3 benchmarks/bench_html_extractor.py [--corpus DIR] [--limit 1500]
+
+`--corpus` points to a directory of saved `.html` pages. Without it, a set of
+synthetic pages shaped like typical articles (navigation, scripts, long
+bodies) is generated in memory.
+"""
+import argparse
+import glob
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_PATH)
+
+from tools.html_extractor import extract_text
+
+_WORDS = "the bot answers questions about weather search results and many other topics quickly".split()
+
+
+def _synthetic_page(rng: random.Random, paragraphs: int) -> str:
+    """
+    Builds an article-like HTML page.
+    """
+    def sentence() -> str:
+        return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(8, 20))).capitalize() + "."
+
+    head = "<head><title>Article</title><style>" + "p{margin:0}" * 200 + "</style>" \
+           + "<script>" + "var x = 1;" * 2000 + "</script></head>"
+    nav = "<nav><ul>" + "".join(f"<li><a href='/{i}'>Link {i}</a></li>" for i in range(100)) + "</ul></nav>"
+    body = "".join(
+        f"<div class='block'><p>{' '.join(sentence() for _ in range(5))} <b>bold</b> &amp; more</p></div>"
+        for _ in range(paragraphs)
+    )
+    return f"<!DOCTYPE html><html>{head}<body>{nav}<article>{body}</article></body></html>"
+
+
+def _load_corpus(corpus: str) -> list[str]:
+    """
+    Reads saved pages, or generates synthetic ones when no corpus is given.
+    """
+    if corpus:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(corpus, "*.html"))):
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                pages.append(f.read())
+        return pages
+
+    rng = random.Random(42)
+    return [_synthetic_page(rng, rng.randint(50, 400)) for _ in range(50)]
+
+
+def _beautifulsoup_text(html: str, limit: int) -> str:
+    """
+    The previous extraction path: parse the whole page, then cut the text.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    return "\n".join([para.get_text() for para in soup.find_all("p")])[:limit]
+
+
+def _measure(func, pages: list[str], limit: int) -> tuple[float, float]:
+    """
+    Returns the mean time per page in milliseconds and the peak memory in MiB.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    for html in pages:
+        func(html, limit)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed / len(pages) * 1000, peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Directory of saved .html pages")
+    parser.add_argument("--limit", type=int, default=1500, help="Characters of text kept per page")
+    args = parser.parse_args()
+
+    pages = _load_corpus(args.corpus)
+    if not pages:
+        sys.exit(f"No .html pages found in {args.corpus}")
+    average_kib = sum(len(html) for html in pages) / len(pages) / 1024
+    print(f"{len(pages)} pages, {average_kib:.0f} KiB on average, limit {args.limit} characters")
+
+    mismatches = sum(
+        extract_text(html, args.limit).split() != _beautifulsoup_text(html, args.limit).split()
+        for html in pages
+    )
+    print(f"Pages whose extracted words differ: {mismatches}")
+
+    soup_ms, soup_mib = _measure(_beautifulsoup_text, pages, args.limit)
+    fast_ms, fast_mib = _measure(extract_text, pages, args.limit)
+    print(f"BeautifulSoup:       {soup_ms:8.2f} ms/page, peak {soup_mib:7.2f} MiB")
+    print(f"Incremental parser:  {fast_ms:8.2f} ms/page, peak {fast_mib:7.2f} MiB ({soup_ms / fast_ms:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Load test of the whole bot against local stand-ins for every external API.
+
+Usage:
+    $ python3 benchmarks/bench_load.py [--users 2000] [--concurrency 200] [--commands 4]
+                                       [--openai-latency 0.5] [--openai-jitter 0.2]
+
+The Agent's application is started against a fake Bot API, fake chat
+completions, a fake Custom Search API with fake result pages and a fake
+OpenWeatherMap API. Synthetic users then issue random `/gpt`, `/search`
+and `/weather` commands; every `/search` is followed by a press of its
+'Yes' or 'No' button. A user sends the next update only after the bot has
+replied to the previous one, and `--concurrency` users are active at once.
+
+Updates are put on the application's update queue, the way the webhook
+server does. The script reports updates per second, latency percentiles
+per command (from the update being queued to the reply reaching the fake
+Bot API), the calls received by each fake server and the memory usage of
+the process, which includes the fake servers. With `STREAM_RESPONSES=true`
+a `/gpt` reply counts as received when the message shows the complete
+answer, not when the placeholder is sent.
+
+Settings of the bot can be overridden through the usual environment
+variables, e.g. `GPT_MAX_CONCURRENT=32 python3 benchmarks/bench_load.py`.
+"""
+import argparse
+import asyncio
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_PATH)
+
+from fake_servers import (
+    FakeBotAPI, FakeOpenAI, FakeWebsite, FakeSearchAPI, FakeWeatherAPI,
+    BOT_TOKEN, command_update, callback_update
+)
+
+CITIES = ["Seoul", "Busan", "Tokyo", "London", "Paris", "Berlin", "New York", "Sydney", "Cairo", "Lima"]
+SUBJECTS = ["python", "sqlite", "telegram bots", "rate limiting", "caching", "asyncio", "web scraping", "markdown"]
+QUESTIONS = ["How does {} work?", "What are common mistakes with {}?", "Explain {} to a beginner.", "Why is {} slow?"]
+
+
+def _percentiles(name: str, samples: list[float]):
+    samples = sorted(samples)
+    if not samples:
+        print(f"{name:<16} no samples")
+        return
+    pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))] * 1000
+    print(f"{name:<16} {len(samples):>6} | p50 {pick(0.50):8.1f} ms | p95 {pick(0.95):8.1f} ms | "
+          f"p99 {pick(0.99):8.1f} ms | mean {statistics.mean(samples) * 1000:8.1f} ms")
+
+
+def _rss_mb() -> float:
+    """
+    Returns the current resident set size of the process in MiB, or 0 if unknown.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return 0.0
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def _question(rng: random.Random, topics: int) -> str:
+    """
+    Returns one of `topics` distinct questions, so that repeated questions can hit the answer cache.
+    """
+    index = rng.randrange(topics)
+    subject = SUBJECTS[index % len(SUBJECTS)]
+    template = QUESTIONS[(index // len(SUBJECTS)) % len(QUESTIONS)]
+    return f"{template.format(subject)} (topic {index})"
+
+
+async def main(args: argparse.Namespace):
+    bot_api = FakeBotAPI()
+    openai_api = FakeOpenAI(latency=args.openai_latency, jitter=args.openai_jitter)
+    website = FakeWebsite(latency=args.page_latency)
+    search_api = FakeSearchAPI(website)
+    weather_api = FakeWeatherAPI()
+    servers = [bot_api, openai_api, website, search_api, weather_api]
+    for server in servers:
+        await server.start()
+
+    # Configure the bot before it is imported; settings are read at import time.
+    # Explicit environment variables take precedence over these defaults.
+    os.environ.update({
+        "BOT_TOKEN": BOT_TOKEN,
+        "BOT_API_URL": bot_api.url,
+        "OPENAI_API_KEY": "benchmark",
+        "OPENAI_BASE_URL": f"{openai_api.url}/v1",
+        "GOOGLE_API_KEY": "benchmark",
+        "GOOGLE_CX_ID": "benchmark",
+        "GOOGLE_SEARCH_URL": search_api.search_url,
+        "OPENWEATHERMAP_API_KEY": "benchmark",
+        "WEATHER_URL": weather_api.weather_url,
+        "METRICS_PORT": "0",
+    })
+    for key, value in {
+        # The fake API has no rate limits; the scheduler still bounds concurrent calls
+        "OPENAI_REQUESTS_PER_MINUTE": "1000000",
+        "OPENAI_TOKENS_PER_MINUTE": "1000000000",
+        # Every user has its own chat, so only the global send limit matters
+        "SEND_GLOBAL_RATE": "100000",
+        # Keep thousands of request logs off the console
+        "LOG_LEVEL": "WARNING",
+    }.items():
+        os.environ.setdefault(key, value)
+
+    from telegram import Update
+    from bot import Agent
+    from tools import text2markdown
+
+    agent = Agent()
+    agent._add_handlers()
+    application = agent.application
+
+    # A streamed answer is complete once the message shows the whole answer or an error
+    final_answer = text2markdown(FakeOpenAI.ANSWER)
+    streamed = lambda text: text == final_answer or text.startswith("⚠️")
+    gpt_reply = streamed if agent.gpt_agent.STREAM_RESPONSES else None
+
+    rng = random.Random(args.seed)
+    latencies: dict[str, list[float]] = defaultdict(list)
+    timeouts: dict[str, int] = defaultdict(int)
+    update_ids = iter(range(1, 10**9))
+    slots = asyncio.Semaphore(args.concurrency)
+
+    async def send(name: str, user_id: int, data: dict) -> bool:
+        """
+        Queues an update and waits for the bot's reply; returns False on timeout.
+        """
+        replied = bot_api.wait_for_message(user_id, gpt_reply if name == "/gpt" else None)
+        start = time.perf_counter()
+        await application.update_queue.put(Update.de_json(data, application.bot))
+        try:
+            latencies[name].append(await asyncio.wait_for(replied, args.timeout) - start)
+            return True
+        except asyncio.TimeoutError:
+            timeouts[name] += 1
+            return False
+
+    async def run_user(user_id: int):
+        async with slots:
+            for _ in range(args.commands):
+                command = rng.choice(("/gpt", "/search", "/weather"))
+                if command == "/weather":
+                    await send(command, user_id, command_update(next(update_ids), user_id, f"/weather {rng.choice(CITIES)}"))
+                    continue
+
+                question = _question(rng, args.topics)
+                if not await send(command, user_id, command_update(next(update_ids), user_id, f"{command} {question}")):
+                    continue
+                if command == "/search":
+                    button = "gpt_yes_search" if rng.random() < args.search_ratio else "gpt_no_search"
+                    name = "search yes" if button == "gpt_yes_search" else "search no"
+                    await send(name, user_id, callback_update(next(update_ids), user_id, button))
+
+    rss_before = _rss_mb()
+    async with application:
+        await agent._post_init(application)
+        await application.start()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(run_user(10_000 + user) for user in range(args.users)))
+        elapsed = time.perf_counter() - start
+        rss_after = _rss_mb()
+
+        await application.stop()
+    await agent._post_shutdown(application)
+
+    for server in servers:
+        await server.stop()
+
+    replies = sum(len(samples) for samples in latencies.values())
+    print(f"{args.users} users, {replies} replies in {elapsed:.2f} s "
+          f"({replies / elapsed:.1f} updates/s, concurrency {args.concurrency})")
+    for name in ("/gpt", "/search", "search yes", "search no", "/weather"):
+        _percentiles(name, latencies[name])
+    if timeouts:
+        print("Timed out:", ", ".join(f"{name} {count}" for name, count in timeouts.items()))
+    print(f"Fake server calls: OpenAI {openai_api.calls} | search {search_api.calls} | "
+          f"pages {website.calls} | weather {weather_api.calls} | "
+          f"Bot API {sum(bot_api.calls.values())} ({dict(bot_api.calls)})")
+    print(f"Memory: RSS {rss_before:.1f} MiB before, {rss_after:.1f} MiB after load, peak {_peak_rss_mb():.1f} MiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000, help="Number of synthetic users")
+    parser.add_argument("--concurrency", type=int, default=200, help="Number of users active at once")
+    parser.add_argument("--commands", type=int, default=4, help="Commands issued by every user")
+    parser.add_argument("--topics", type=int, default=500, help="Distinct questions asked by all users")
+    parser.add_argument("--search-ratio", type=float, default=0.7, help="Share of searches confirmed with 'Yes'")
+    parser.add_argument("--openai-latency", type=float, default=0.5, help="Minimum seconds of a completion")
+    parser.add_argument("--openai-jitter", type=float, default=0.2, help="Additional random seconds of a completion")
+    parser.add_argument("--page-latency", type=float, default=0.05, help="Seconds before a result page is served")
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds to wait for a reply")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random command mix")
+    args = parser.parse_args()
+
+    # Keep the chat database, search cache and logs out of the repository; prompts are read from ./src
+    with tempfile.TemporaryDirectory() as workdir:
+        os.symlink(os.path.abspath(SRC_PATH), os.path.join(workdir, "src"))
+        os.chdir(workdir)
+        asyncio.run(main(args))
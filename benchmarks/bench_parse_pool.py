@@ -0,0 +1,90 @@
+"""
+Measures event loop latency while search pages are being parsed.
+
+Usage:
+    $ python3 benchmarks/bench_parse_pool.py [--pages 40] [--workers 4]
+
+A probe coroutine sleeps for 1 ms in a loop and records how late it wakes
+up. The same pages are parsed on the event loop, in a thread pool and in a
+process pool, with several "searches" running at once.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_PATH)
+
+from tools import ParsePool
+from tools.html_extractor import extract_text_from_bytes
+from bench_html_extractor import _synthetic_page
+
+# Parse full pages so that every run does the same amount of work
+LIMIT = 10 ** 9
+
+
+async def _probe(stop: asyncio.Event, lags: list[float]):
+    """
+    Records how late a 1 ms sleep wakes up until `stop` is set.
+    """
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append((time.perf_counter() - start - 0.001) * 1000)
+
+
+async def _run(pages: list[bytes], parse, concurrency: int) -> tuple[float, list[float]]:
+    """
+    Parses all pages with `concurrency` concurrent searches and returns the
+    elapsed time and the observed event loop lags.
+    """
+    lags: list[float] = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe(stop, lags))
+
+    async def search(batch: list[bytes]):
+        for page in batch:
+            await parse(page)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(search(pages[i::concurrency]) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+    return elapsed, lags
+
+
+def _report(name: str, elapsed: float, lags: list[float]):
+    lags.sort()
+    p99 = lags[int(len(lags) * 0.99) - 1] if lags else 0.0
+    print(f"{name:<14} total {elapsed:6.2f} s | loop lag median {statistics.median(lags or [0]):7.2f} ms, "
+          f"p99 {p99:7.2f} ms, max {max(lags or [0]):7.2f} ms")
+
+
+async def main(pages: list[bytes], workers: int, concurrency: int):
+    async def inline(page: bytes):
+        extract_text_from_bytes(page, "utf-8", LIMIT)
+        await asyncio.sleep(0)
+
+    _report("event loop", *await _run(pages, inline, concurrency))
+
+    for name, use_processes in (("thread pool", False), ("process pool", True)):
+        pool = ParsePool(workers=workers, use_processes=use_processes)
+        _report(name, *await _run(pages, lambda page: pool.extract_text(page, "utf-8", LIMIT), concurrency))
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=40, help="Number of pages to parse")
+    parser.add_argument("--workers", type=int, default=4, help="Number of pool workers")
+    parser.add_argument("--concurrency", type=int, default=5, help="Number of concurrent searches")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    pages = [_synthetic_page(rng, 300).encode() for _ in range(args.pages)]
+    asyncio.run(main(pages, args.workers, args.concurrency))
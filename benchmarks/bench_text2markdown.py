@@ -0,0 +1,106 @@
+"""
+Compares the previous regex-callback MarkdownV2 escaper with the
+escape-table escaper in tools/text2markdown.py.
+
+Usage:
+    $ python3 benchmarks/bench_text2markdown.py [--answers 200] [--repeat 20]
+
+The input is synthetic GPT output: headings, bullet lists with punctuation,
+links, numbers and code blocks, in the sizes /gpt and /search answers have.
+Outputs of both escapers must be identical for answers without code, where
+the old escaper was already correct.
+"""
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_PATH)
+
+from tools.text2markdown import text2markdown
+
+WORDS = ("the model returns a result for each request and the value is cached in memory so that "
+         "repeated questions are answered quickly while new ones reach the api").split()
+
+
+def _legacy_text2markdown(text: str) -> str:
+    """
+    The escaper before the escape-table rewrite.
+    """
+    special_chars = r"_\*\[\]\(\)~>#\+\-=|{}.!"
+    text = text.replace("\\", "\\\\")
+
+    def escape_special(match):
+        if match.group(0) in ["*", "_"]:
+            return match.group(0)
+        return "\\" + match.group(0)
+
+    return re.sub(f"([{special_chars}])", escape_special, text)
+
+
+def _sentence(rng: random.Random) -> str:
+    words = rng.choices(WORDS, k=rng.randint(8, 20))
+    if rng.random() < 0.3:
+        words.insert(rng.randrange(len(words)), f"{rng.randint(1, 99)}.{rng.randint(0, 9)}%")
+    if rng.random() < 0.2:
+        words.insert(rng.randrange(len(words)), "(see [docs](https://example.com/a-b?x=1))")
+    return " ".join(words).capitalize() + rng.choice([".", "!", "?", "."])
+
+
+def _answer(rng: random.Random, with_code: bool) -> str:
+    """
+    Builds a GPT-like answer of roughly 1 to 3 KB.
+    """
+    lines = [f"*{_sentence(rng)[:40]}*", ""]
+    for section in range(rng.randint(2, 4)):
+        lines.append(f"*{section + 1}. {rng.choice(WORDS).title()}*")
+        for _ in range(rng.randint(2, 5)):
+            lines.append(f"- {_sentence(rng)} _{rng.choice(WORDS)}_ -> {rng.randint(1, 500)}")
+        if with_code and rng.random() < 0.6:
+            lines.append("```python\nresult = {'key': value + 1}  # cache hit!\nprint(f\"{result}\")\n```")
+        lines.append("")
+    if with_code:
+        lines.append(f"Use `cache.get(key)` or `{rng.choice(WORDS)}.set()` = done.")
+    return "\n".join(lines)
+
+
+def _time(escape, answers: list[str], repeat: int) -> float:
+    """
+    Returns the median time in microseconds to escape one answer.
+    """
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for answer in answers:
+            escape(answer)
+        runs.append((time.perf_counter() - start) / len(answers) * 1e6)
+    return statistics.median(runs)
+
+
+def main(count: int, repeat: int):
+    rng = random.Random(21)
+    plain = [_answer(rng, with_code=False) for _ in range(count)]
+    with_code = [_answer(rng, with_code=True) for _ in range(count)]
+
+    mismatches = sum(_legacy_text2markdown(answer) != text2markdown(answer) for answer in plain)
+    print(f"Answers without code: {mismatches} of {count} outputs differ from the previous escaper")
+    average = statistics.mean(len(answer) for answer in plain + with_code)
+    print(f"Average answer length: {average:.0f} characters\n")
+
+    for name, answers in (("without code", plain), ("with code", with_code)):
+        legacy = _time(_legacy_text2markdown, answers, repeat)
+        current = _time(text2markdown, answers, repeat)
+        print(f"{name:<13} previous {legacy:8.1f} us | escape table {current:8.1f} us | "
+              f"speedup {legacy / current:5.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--answers", type=int, default=200, help="Number of answers of each kind")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs over all answers")
+    args = parser.parse_args()
+    main(args.answers, args.repeat)
@@ -0,0 +1,132 @@
+"""
+Measures update latency of the bot in webhook mode without the real Telegram API.
+
+Usage:
+    $ python3 benchmarks/bench_webhook.py [--updates 2000] [--concurrency 50]
+
+The Agent is started in webhook mode against a local fake Bot API. Fake
+`/help` updates from distinct users are posted to the webhook with the
+secret token, and for every update the script records how long the webhook
+took to acknowledge it, when a handler started processing it and when the
+reply reached the fake Bot API.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_PATH)
+
+from fake_servers import FakeBotAPI, BOT_TOKEN, command_update
+
+SECRET = "benchmark-secret"
+
+
+def _percentiles(name: str, samples: list[float]):
+    samples = sorted(samples)
+    if not samples:
+        print(f"{name:<22} no samples")
+        return
+    pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))] * 1000
+    print(f"{name:<22} p50 {pick(0.50):8.2f} ms | p95 {pick(0.95):8.2f} ms | p99 {pick(0.99):8.2f} ms | "
+          f"mean {statistics.mean(samples) * 1000:8.2f} ms")
+
+
+async def main(updates: int, concurrency: int):
+    bot_api = FakeBotAPI()
+    await bot_api.start()
+
+    # Configure the bot before it is imported; class settings are read at import time
+    port = 18080
+    os.environ.update({
+        "BOT_TOKEN": BOT_TOKEN,
+        "BOT_API_URL": bot_api.url,
+        "OPENAI_API_KEY": "benchmark",
+        "UPDATE_MODE": "webhook",
+        "WEBHOOK_SECRET": SECRET,
+        "WEBHOOK_HOST": "127.0.0.1",
+        "WEBHOOK_PORT": str(port),
+        # Every update comes from its own chat, so only the global send limit matters
+        "SEND_GLOBAL_RATE": "100000",
+    })
+    from telegram import Update
+    from telegram.ext import TypeHandler
+    from bot import Agent
+
+    agent = Agent()
+    agent._add_handlers()
+
+    dispatched: dict[int, float] = {}
+
+    async def record_dispatch(update: Update, context):
+        dispatched[update.update_id] = time.perf_counter()
+
+    agent.application.add_handler(TypeHandler(Update, record_dispatch), group=-2)
+
+    stop = asyncio.Event()
+    bot_task = asyncio.create_task(agent._run_webhook(stop))
+
+    webhook_url = f"http://127.0.0.1:{port}{agent.WEBHOOK_PATH}"
+    async with aiohttp.ClientSession() as session:
+        # Wait until the webhook server reports that it is ready
+        while True:
+            try:
+                async with session.get(f"http://127.0.0.1:{port}/readyz") as resp:
+                    if resp.status == 200:
+                        break
+            except aiohttp.ClientConnectionError:
+                pass
+            await asyncio.sleep(0.05)
+
+        async with session.post(webhook_url, json=command_update(0, 1, "/help")) as resp:
+            print(f"Request without secret token: HTTP {resp.status}")
+
+        ack, dispatch, reply = [], [], []
+        slots = asyncio.Semaphore(concurrency)
+
+        async def send(update_id: int):
+            user_id = 1000 + update_id
+            async with slots:
+                replied = bot_api.wait_for_message(user_id)
+                start = time.perf_counter()
+                async with session.post(
+                    webhook_url,
+                    json=command_update(update_id, user_id, "/help"),
+                    headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}
+                ) as resp:
+                    resp.raise_for_status()
+                ack.append(time.perf_counter() - start)
+                reply.append(await replied - start)
+                dispatch.append(dispatched[update_id] - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(send(update_id) for update_id in range(1, updates + 1)))
+        elapsed = time.perf_counter() - start
+
+    stop.set()
+    await bot_task
+    await bot_api.stop()
+
+    print(f"{updates} updates in {elapsed:.2f} s ({updates / elapsed:.0f} updates/s, concurrency {concurrency})")
+    _percentiles("webhook acknowledged", ack)
+    _percentiles("handler started", dispatch)
+    _percentiles("reply sent", reply)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=2000, help="Number of updates to post")
+    parser.add_argument("--concurrency", type=int, default=50, help="Number of updates in flight at once")
+    args = parser.parse_args()
+
+    # Keep the chat database and logs out of the repository; prompts are read from ./src
+    with tempfile.TemporaryDirectory() as workdir:
+        os.symlink(os.path.abspath(SRC_PATH), os.path.join(workdir, "src"))
+        os.chdir(workdir)
+        asyncio.run(main(args.updates, args.concurrency))
@@ -0,0 +1,82 @@
+"""
+Measures chat history write throughput with and without group commit.
+
+Usage:
+    $ python3 benchmarks/bench_write_throughput.py [--users 200] [--messages 50]
+
+The baseline opens a connection and commits every message on its own, the
+way the bot used to. The group commit run issues the same writes from
+concurrent coroutines through `async_chat_database`. Both runs write to a
+single database file in a temporary directory.
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_PATH)
+
+
+def _run_baseline(db_path: str, schema: str, users: int, messages: int) -> float:
+    """
+    Commits every message on a fresh connection and returns messages per second.
+    """
+    conn = sqlite3.connect(db_path)
+    conn.executescript(schema)
+    conn.close()
+
+    start = time.perf_counter()
+    for i in range(messages):
+        for user_id in range(users):
+            conn = sqlite3.connect(db_path)
+            conn.execute(
+                "INSERT INTO messages (user_id, username, sender, message) VALUES (?, ?, ?, ?)",
+                (user_id, f"user{user_id}", "user", f"Baseline message {i}")
+            )
+            conn.commit()
+            conn.close()
+    return users * messages / (time.perf_counter() - start)
+
+
+async def _run_group_commit(async_chat_database, users: int, messages: int) -> float:
+    """
+    Saves messages from concurrent conversations and returns messages per second.
+    """
+    async def conversation(user_id: int):
+        for i in range(messages):
+            await async_chat_database.save_message(user_id, f"user{user_id}", "user", f"Grouped message {i}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(conversation(user_id) for user_id in range(users)))
+    elapsed = time.perf_counter() - start
+    await async_chat_database.close()
+    return users * messages / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200, help="Number of concurrent conversations")
+    parser.add_argument("--messages", type=int, default=50, help="Messages written per conversation")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        os.environ["CHAT_STORAGE_MODE"] = "consolidated"
+        from databases import chat_database, async_chat_database
+
+        # The baseline only needs a fraction of the writes to get a stable rate
+        baseline_messages = max(1, args.messages // 10)
+        baseline_path = os.path.join(workdir, "baseline.db")
+        baseline = _run_baseline(baseline_path, chat_database._MESSAGES_SCHEMA, args.users, baseline_messages)
+        grouped = asyncio.run(_run_group_commit(async_chat_database, args.users, args.messages))
+
+        print(f"Per-message commits: {baseline:>10.0f} messages/s")
+        print(f"Group commit:        {grouped:>10.0f} messages/s ({grouped / baseline:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
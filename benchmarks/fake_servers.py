@@ -0,0 +1,359 @@
+"""
+Local stand-ins for the external HTTP APIs used by the bot.
+
+The servers answer just enough of each API for the bot to run offline in
+benchmarks, and record the calls they receive.
+"""
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from typing import Callable
+from urllib.parse import quote
+
+from aiohttp import web
+
+BOT_TOKEN = "123456:FAKE-TOKEN"
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Fake bot", "username": "fake_bot"}
+
+
+async def _parameters(request: web.Request) -> dict:
+    """
+    Returns the parameters of a Bot API request, sent as JSON or as a form.
+    """
+    if request.content_type == "application/json":
+        return await request.json()
+
+    parameters = {}
+    for key, value in (await request.post()).items():
+        try:
+            parameters[key] = json.loads(value)
+        except (TypeError, ValueError):
+            parameters[key] = value
+    return parameters
+
+
+class FakeServer:
+    """
+    Base class of the fake servers: runs an aiohttp application on a free local port.
+    """
+
+    def __init__(self):
+        self.app = web.Application()
+        self.port: int = None
+        self._runner: web.AppRunner = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+class FakeBotAPI(FakeServer):
+    """
+    Telegram Bot API stand-in.
+
+    Messages sent by the bot, and edits of them, are recorded per chat with
+    their arrival time; `wait_for_message` lets a benchmark wait until a chat
+    receives a reply.
+    """
+
+    def __init__(self, token: str = BOT_TOKEN):
+        super().__init__()
+        self.token = token
+        self.calls = defaultdict(int)
+        self.messages: dict[int, list[tuple[float, str]]] = defaultdict(list)
+        self._waiters: dict[int, list[tuple[asyncio.Future, Callable[[str], bool]]]] = defaultdict(list)
+        self._message_id = 0
+        self.app.router.add_post("/bot{token}/{method}", self._handle)
+
+    def wait_for_message(self, chat_id: int, predicate: Callable[[str], bool] = None) -> asyncio.Future:
+        """
+        Returns a future resolved with the arrival time of the next message sent to a chat.
+
+        Args:
+            chat_id (int): Identifier of the chat.
+            predicate (Callable[[str], bool], optional): Only messages and edits whose text
+                                                         it accepts resolve the future,
+                                                         e.g. the final edit of a streamed answer.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[chat_id].append((future, predicate))
+        return future
+
+    def _message(self, chat_id: int, text: str) -> dict:
+        self._message_id += 1
+        return {
+            "message_id": self._message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "group"},
+            "from": BOT_USER,
+            "text": text,
+        }
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        parameters = await _parameters(request)
+
+        if method == "getMe":
+            result = BOT_USER
+        elif method == "getUpdates":
+            # Long polling without updates
+            await asyncio.sleep(min(float(parameters.get("timeout", 0) or 0), 1.0))
+            result = []
+        elif method in ("sendMessage", "editMessageText"):
+            chat_id = int(parameters.get("chat_id", 0))
+            text = parameters.get("text", "")
+            now = time.perf_counter()
+            self.messages[chat_id].append((now, text))
+            waiting = []
+            for future, predicate in self._waiters.pop(chat_id, []):
+                if future.done():
+                    continue
+                if predicate is None or predicate(text):
+                    future.set_result(now)
+                else:
+                    waiting.append((future, predicate))
+            if waiting:
+                self._waiters[chat_id] = waiting
+            result = self._message(chat_id, text)
+        else:
+            result = True
+
+        return web.json_response({"ok": True, "result": result})
+
+
+def command_update(update_id: int, user_id: int, text: str) -> dict:
+    """
+    Builds the JSON of a Telegram update with a private message from a user.
+
+    Args:
+        update_id (int): Identifier of the update.
+        user_id (int): Identifier of the user, also used as the chat identifier.
+        text (str): Message text; a leading '/command' is marked as a bot command.
+
+    Returns:
+        dict: The update as Telegram would send it.
+    """
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": "User", "username": f"user{user_id}"},
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": update_id, "message": message}
+
+
+def callback_update(update_id: int, user_id: int, data: str, message_id: int = 1) -> dict:
+    """
+    Builds the JSON of a Telegram update with an inline button press.
+
+    Args:
+        update_id (int): Identifier of the update.
+        user_id (int): Identifier of the user, also used as the chat identifier.
+        data (str): Callback data of the pressed button.
+        message_id (int): Identifier of the bot message the button belongs to.
+
+    Returns:
+        dict: The update as Telegram would send it.
+    """
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": {"id": user_id, "is_bot": False, "first_name": "User", "username": f"user{user_id}"},
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": BOT_USER,
+                "text": "Search?",
+            },
+        },
+    }
+
+
+class FakeOpenAI(FakeServer):
+    """
+    Chat completions stand-in with configurable latency.
+
+    Every completion takes `latency` seconds plus up to `jitter` seconds;
+    streamed completions spread that time over their chunks. Keyword
+    extraction requests get a short topic, all others a markdown answer.
+    """
+
+    ANSWER = (
+        "*Summary*\n\n"
+        "The answer to this question depends on a few factors. First, the request is parsed "
+        "and checked. Second, the result is computed and cached so that later requests are fast.\n\n"
+        "- Point one: latency matters (p95 < 1s)\n"
+        "- Point two: use `cache.get(key)` before calling the API\n"
+        "- Point three: see [the docs](https://example.com/docs) for details.\n\n"
+        "```python\nresult = compute(value)\nprint(result)\n```"
+    )
+
+    def __init__(self, latency: float = 0.5, jitter: float = 0.2, chunks: int = 20):
+        """
+        Args:
+            latency (float): Minimum seconds a completion takes.
+            jitter (float): Additional random seconds, uniformly distributed.
+            chunks (int): Number of chunks of a streamed completion.
+        """
+        super().__init__()
+        self.latency = latency
+        self.jitter = jitter
+        self.chunks = chunks
+        self.calls = 0
+        self.app.router.add_post("/v1/chat/completions", self._handle)
+
+    def _content(self, messages: list[dict]) -> str:
+        if "key topic" in messages[0]["content"].lower():
+            return " ".join(messages[-1]["content"].split()[-3:])[:30]
+        return self.ANSWER
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        self.calls += 1
+        body = await request.json()
+        content = self._content(body["messages"])
+        duration = self.latency + random.uniform(0, self.jitter)
+        base = {"id": f"chatcmpl-{self.calls}", "created": int(time.time()), "model": body.get("model", "gpt")}
+        completion_tokens = len(content) // 4
+        prompt_tokens = sum(len(message["content"]) for message in body["messages"]) // 4
+
+        if not body.get("stream"):
+            await asyncio.sleep(duration)
+            return web.json_response(dict(
+                base,
+                object="chat.completion",
+                choices=[{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                usage={"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                       "total_tokens": prompt_tokens + completion_tokens},
+            ))
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        step = max(1, len(content) // self.chunks)
+        for start in range(0, len(content), step):
+            await asyncio.sleep(duration / self.chunks)
+            chunk = dict(base, object="chat.completion.chunk", choices=[
+                {"index": 0, "delta": {"content": content[start:start + step]}, "finish_reason": None}
+            ])
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+
+class FakeWebsite(FakeServer):
+    """
+    HTML pages of search results, served after a configurable delay.
+    """
+
+    PARAGRAPH = (
+        "<p>This page explains the topic in detail. It covers the background, the main ideas and "
+        "several examples, and it links to further reading for anyone who wants to learn more.</p>"
+    )
+
+    def __init__(self, latency: float = 0.05, paragraphs: int = 30):
+        """
+        Args:
+            latency (float): Seconds before a page is returned.
+            paragraphs (int): Paragraphs of every page.
+        """
+        super().__init__()
+        self.latency = latency
+        self.paragraphs = paragraphs
+        self.calls = 0
+        self.app.router.add_get("/page/{page}", self._handle)
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        topic = request.query.get("q", "topic")
+        html = (
+            f"<html><head><title>{topic}</title></head><body><nav>Home | About</nav><article>"
+            f"<h1>{topic}</h1>{self.PARAGRAPH * self.paragraphs}</article><footer>Footer</footer></body></html>"
+        )
+        return web.Response(text=html, content_type="text/html")
+
+
+class FakeSearchAPI(FakeServer):
+    """
+    Google Custom Search stand-in whose results link to a `FakeWebsite`.
+    """
+
+    def __init__(self, website: FakeWebsite, latency: float = 0.1, results: int = 5):
+        """
+        Args:
+            website (FakeWebsite): Server of the result pages.
+            latency (float): Seconds before a response is returned.
+            results (int): Results of every search.
+        """
+        super().__init__()
+        self.website = website
+        self.latency = latency
+        self.results = results
+        self.calls = 0
+        self.app.router.add_get("/customsearch/v1", self._handle)
+
+    @property
+    def search_url(self) -> str:
+        return f"{self.url}/customsearch/v1"
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        query = request.query.get("q", "")
+        items = [
+            {"title": f"{query} ({rank + 1})", "link": f"{self.website.url}/page/{rank}?q={quote(query)}"}
+            for rank in range(self.results)
+        ]
+        return web.json_response({"items": items})
+
+
+class FakeWeatherAPI(FakeServer):
+    """
+    OpenWeatherMap current weather stand-in.
+    """
+
+    def __init__(self, latency: float = 0.05):
+        """
+        Args:
+            latency (float): Seconds before a response is returned.
+        """
+        super().__init__()
+        self.latency = latency
+        self.calls = 0
+        self.app.router.add_get("/data/2.5/weather", self._handle)
+
+    @property
+    def weather_url(self) -> str:
+        return f"{self.url}/data/2.5/weather"
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        city = request.query.get("q", "")
+        return web.json_response({
+            "name": city.title(),
+            "weather": [{"description": "clear sky"}],
+            "main": {"temp": 21.5, "humidity": 40},
+            "wind": {"speed": 3.2},
+        })
@@ -2,13 +2,18 @@
 We are trying to create a bot that can communicate through the LLM model.
 The ability to give commands through `/` in Telegram and chat with bots in general conversations.
 """
-from telegram import BotCommand
+from telegram import BotCommand, Update
 from telegram.ext import *
 
-from tools import setup_logger
+from tools import setup_logger, send_queue, track_incoming_message, instrument_handler, watch_cache, MetricsServer
+from databases import async_chat_database, cache_stats
+from webhook_server import WebhookServer
 from dotenv import load_dotenv
+import asyncio
 import logging
 import os
+import secrets
+import signal
 
 # Load bot commands
 from commands import *
@@ -22,18 +27,44 @@ class Agent:
     load_dotenv()
     TOKEN = os.getenv("BOT_TOKEN")
 
+    # Number of updates processed at the same time
+    CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "64"))
+
+    # Bot API server, e.g. a self-hosted one; the public API is used if unset
+    BOT_API_URL = os.getenv("BOT_API_URL")
+
+    # How updates are received: 'polling' or 'webhook'
+    UPDATE_MODE = os.getenv("UPDATE_MODE", "polling").lower()
+
+    # Webhook mode: public URL registered with Telegram, secret token and local listener
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+    WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+
+    # Local Prometheus metrics endpoint, served only if METRICS_PORT is set
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
     def __init__(self):
         """
         Initializes the Agent object by loading the Telegram bot token
         from the environment and setting up the application, logging,
         and bot commands.
         """
-        self.application = (
+        builder = (
             ApplicationBuilder()
             .token(self.TOKEN)
+            .concurrent_updates(self.CONCURRENT_UPDATES)
             .post_init(self._post_init)
-            .build()
+            .post_shutdown(self._post_shutdown)
         )
+        if self.BOT_API_URL:
+            builder = builder.base_url(f"{self.BOT_API_URL}/bot").base_file_url(f"{self.BOT_API_URL}/file/bot")
+        self.application = builder.build()
+        self.gpt_agent: GPT_Agent = None
+        self.metrics_server = MetricsServer(self.METRICS_HOST, self.METRICS_PORT) if self.METRICS_PORT else None
 
     async def _post_init(self, application: Application):
         """
@@ -53,37 +84,137 @@ class Agent:
         ]
         await application.bot.set_my_commands(commands_list)
 
-    def update_handler(self):
+        if self.metrics_server is not None:
+            await self.metrics_server.start()
+
+    async def _post_shutdown(self, application: Application):
         """
-        Configures the handlers for commands and starts polling for updates.
+        Releases resources once the application has stopped processing updates.
+
+        Args:
+            application (telegram.ext.Application): The application that has been shut down.
         """
-        gpt_agent = GPT_Agent()
+        # Flush buffered chat history writes before the process exits
+        await async_chat_database.close()
+        self.logger.info("Chat database has been flushed and closed.")
+
+        if self.gpt_agent is not None:
+            await self.gpt_agent.close()
+        await close_weather_session()
+
+        # Stop the outbound message workers last, after everything that may still send
+        await send_queue.close()
+
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+
+    def _add_handlers(self):
+        """
+        Configures the handlers for commands.
+        """
+        self.gpt_agent = GPT_Agent()
+        gpt_agent = self.gpt_agent
+
+        # Hit and miss counters of the in-memory caches are read when metrics are scraped
+        watch_cache("chat_history", cache_stats)
+        watch_cache("weather", weather_cache_stats)
+        if gpt_agent.response_cache is not None:
+            watch_cache("gpt_response", gpt_agent.response_cache.stats)
+
+        # Every callback is wrapped to record its latency, outcome and concurrency
         handlers = [
-            (CommandHandler("start", start), "/start"),
-            (CommandHandler("help", help), "/help"),
-            (CommandHandler("weather", weather), "/weather"),
-            (CommandHandler("gpt", gpt_agent.gpt_response), "/gpt"),
-            (CommandHandler("search", gpt_agent.search_response), "/search"),
-            (CallbackQueryHandler(gpt_agent.handle_callback_query, pattern="^gpt_.*"), "gpt callback"),
-            (CommandHandler("test", test_response), "/test"),
-            (CommandHandler("empty", empty), "/empty"),
-            (CallbackQueryHandler(button_handler, pattern="^test_.*"), "test callback")
+            (CommandHandler("start", instrument_handler("/start", start)), "/start"),
+            (CommandHandler("help", instrument_handler("/help", help)), "/help"),
+            (CommandHandler("weather", instrument_handler("/weather", weather)), "/weather"),
+            (CommandHandler("gpt", instrument_handler("/gpt", gpt_agent.gpt_response)), "/gpt"),
+            (CommandHandler("search", instrument_handler("/search", gpt_agent.search_response)), "/search"),
+            (CallbackQueryHandler(instrument_handler("gpt callback", gpt_agent.handle_callback_query), pattern="^gpt_.*"), "gpt callback"),
+            (CommandHandler("test", instrument_handler("/test", test_response)), "/test"),
+            (CommandHandler("empty", instrument_handler("/empty", empty)), "/empty"),
+            (CallbackQueryHandler(instrument_handler("test callback", button_handler), pattern="^test_.*"), "test callback")
         ]
 
+        # Remember incoming messages before any command handles them, so /empty can delete them
+        self.application.add_handler(TypeHandler(Update, track_incoming_message), group=-1)
+
         self.logger.info("Initializing command handlers...")
         for handler, description in handlers:
             self.application.add_handler(handler)
             self.logger.info(f"Handler added for '{description}' command.")
         
-        unknown_handler = MessageHandler(filters.COMMAND, unknown)
+        unknown_handler = MessageHandler(filters.COMMAND, instrument_handler("unknown", unknown))
         self.application.add_handler(unknown_handler)
         self.logger.info("Unknown command handler added.")
 
+    async def _run_webhook(self, stop: asyncio.Event = None):
+        """
+        Receives updates through the embedded webhook server until `stop` is set
+        or the process receives SIGINT or SIGTERM.
+
+        Args:
+            stop (asyncio.Event, optional): Event that stops the bot when set.
+        """
+        stop = stop or asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                # Not available on this platform or outside the main thread
+                pass
+
+        secret_token = self.WEBHOOK_SECRET
+        if secret_token is None and self.WEBHOOK_URL:
+            # Telegram sends the registered secret back with every update
+            secret_token = secrets.token_urlsafe(32)
+        if secret_token is None:
+            self.logger.warning("WEBHOOK_SECRET is not set, webhook requests are not authenticated.")
+
+        server = WebhookServer(
+            self.application,
+            path=self.WEBHOOK_PATH,
+            secret_token=secret_token,
+            host=self.WEBHOOK_HOST,
+            port=self.WEBHOOK_PORT
+        )
+
+        # Mirrors run_polling(), which also runs the post_init and post_shutdown callbacks
+        async with self.application:
+            await self._post_init(self.application)
+            await self.application.start()
+            await server.start()
+            if self.WEBHOOK_URL:
+                await self.application.bot.set_webhook(
+                    url=f"{self.WEBHOOK_URL.rstrip('/')}{self.WEBHOOK_PATH}",
+                    secret_token=secret_token,
+                    allowed_updates=Update.ALL_TYPES
+                )
+                self.logger.info("Webhook registered with Telegram.")
+            server.ready = True
+            self.logger.info("Bot is receiving updates by webhook.")
+
+            await stop.wait()
+
+            await server.stop()
+            await self.application.stop()
+        await self._post_shutdown(self.application)
+
+    def update_handler(self):
+        """
+        Configures the handlers for commands and starts receiving updates,
+        by polling or by webhook depending on `UPDATE_MODE`.
+        """
+        self._add_handlers()
+
         try:
-            self.logger.info("Bot is starting polling...")
-            self.application.run_polling()
+            if self.UPDATE_MODE == "webhook":
+                self.logger.info("Bot is starting in webhook mode...")
+                asyncio.run(self._run_webhook())
+            else:
+                self.logger.info("Bot is starting polling...")
+                self.application.run_polling()
         except Exception as e:
-            self.logger.error(f"An error occurred during polling: {e}")
+            self.logger.error(f"An error occurred while receiving updates: {e}")
 
 
 if __name__ == '__main__':
@@ -5,7 +5,7 @@ path.insert(0, dirname(__file__))
 
 from .start import start
 from .help import help
-from .weather import weather
+from .weather import weather, close_weather_session, weather_cache_stats
 from .gpt_agent import GPT_Agent
 from .inline_test import test_response, button_handler
 from .empty import empty
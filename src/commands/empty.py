@@ -1,39 +1,56 @@
 from telegram import Update
-from telegram.ext import CommandHandler, CallbackQueryHandler, ContextTypes, Application
-from tools import send_message, setup_logger
+from telegram.ext import ContextTypes
+from tools import send_message, setup_logger, send_queue, PRIORITY_BULK, pop_tracked_messages
+from databases import async_chat_database
+import asyncio
 import logging
 
 setup_logger()
 logger = logging.getLogger(__name__)
 
-async def _delete_messages(context, chat_id, message_id):
+# Maximum number of messages Telegram deletes in one deleteMessages request
+DELETE_BATCH_SIZE = 100
+
+async def _delete_messages(context, chat_id, message_ids) -> int:
     """
-    Function to delete messages synchronously.
-    Stops when there are no more messages to delete.
+    Deletes messages with Telegram's bulk deleteMessages endpoint.
+
+    The messages are split into batches of `DELETE_BATCH_SIZE`, which are
+    sent concurrently through the send queue at bulk priority, so replies to
+    other users still go first. Telegram skips messages that no longer exist.
+
+    Returns:
+        int: Number of messages in batches that could not be deleted.
     """
-    try:
-        for msg_id in range(message_id, message_id - 100, -1):
-            if msg_id > 0:
-                try:
-                    await context.bot.delete_message(chat_id=chat_id, message_id=msg_id)
-                except Exception as e:
-                    # Stop deleting if message no longer exists
-                    if "message to delete not found" in str(e).lower():
-                        logger.info(f"No more messages to delete after message ID {msg_id}.")
-                        break
-                    logger.debug(f"Skipping message ID {msg_id}: {e}")
-        logger.info(f"Cleared recent chat history for chat ID: {chat_id}")
-    except Exception as e:
-        logger.warning(f"Could not clear chat history for chat ID: {chat_id}: {e}")
+    batches = [message_ids[i:i + DELETE_BATCH_SIZE] for i in range(0, len(message_ids), DELETE_BATCH_SIZE)]
+    results = await asyncio.gather(*(
+        send_queue.submit(
+            chat_id,
+            lambda batch=batch: context.bot.delete_messages(chat_id=chat_id, message_ids=batch),
+            priority=PRIORITY_BULK
+        )
+        for batch in batches
+    ), return_exceptions=True)
+
+    failed_messages = 0
+    failed_batches = 0
+    for batch, result in zip(batches, results):
+        if isinstance(result, Exception):
+            logger.warning("Could not delete a batch of messages in chat ID %s: %s", chat_id, result)
+            failed_messages += len(batch)
+            failed_batches += 1
+    logger.info(
+        "Deleted %d messages in %d of %d batches for chat ID: %s",
+        len(message_ids) - failed_messages, len(batches) - failed_batches, len(batches), chat_id
+    )
+    return failed_messages
 
 async def empty(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Handles the `/empty` command.
 
-    Deletes all previous messages in the chat synchronously
-    and logs the interaction, including user and chat details.
-
-    TODO: Implement functionality to also delete chat history from the database.
+    Deletes the messages exchanged with the bot in this chat and the user's
+    stored chat history, and logs the interaction, including user and chat details.
 
     Args:
         update (Update): Incoming update containing the message from the user.
@@ -44,14 +61,29 @@ async def empty(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
 
     # Log the empty command request
-    logger.info(f"Empty command requested by user '{user.username}' (ID: {user.id}) in chat ID: {chat_id}")
+    logger.info("Empty command requested by user '%s' (ID: %s) in chat ID: %s", user.username, user.id, chat_id)
+
+    # Messages remembered for this chat, including the /empty command itself
+    message_ids = pop_tracked_messages(context)
+    if update.message.message_id not in message_ids:
+        message_ids.append(update.message.message_id)
+
+    failed, _ = await asyncio.gather(
+        _delete_messages(context, chat_id, message_ids),
+        async_chat_database.delete_messages(user.id, user.username)
+    )
+    logger.info("Cleared stored chat history of user '%s' (ID: %s)", user.username, user.id)
 
-    # Synchronously delete messages
-    message_id = update.message.message_id
-    await _delete_messages(context, chat_id, message_id)
+    # The stored history is gone either way; tell the user if messages are still visible
+    if not failed:
+        text = "Chat history has been cleared."
+    elif failed < len(message_ids):
+        text = f"⚠️ Chat history has been cleared, but {failed} of {len(message_ids)} messages could not be deleted."
+    else:
+        text = "⚠️ Stored chat history has been cleared, but the messages in this chat could not be deleted."
 
     await send_message(
         update=update,
         context=context,
-        text="Chat history has been cleared."
-    )
\ No newline at end of file
+        text=text
+    )
@@ -1,15 +1,18 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
+import asyncio
+import hashlib
+import json
+import time
 import openai
-from bs4 import BeautifulSoup
 import aiohttp
 from dotenv import load_dotenv
 import logging
 import os
 
-from tools import send_message, setup_logger, load_prompt
-from databases import init_user_db, save_message, load_messages
+from tools import send_message, setup_logger, load_prompt, build_context, StreamingMessage, extract_paragraphs, read_body, ParsePool, pack_passages, RequestScheduler, SchedulerBusyError, RateLimiter, CircuitBreaker, estimate_tokens, ResponseCache, response_context_key, track
+from databases import init_user_db, async_chat_database, SearchCache
 
 class GPT_Agent:
     """
@@ -28,17 +31,68 @@ class GPT_Agent:
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
     GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
     GOOGLE_CX_ID = os.getenv("GOOGLE_CX_ID")
-    GOOGLE_SEARCH_URL = "https://www.googleapis.com/customsearch/v1"
+    GOOGLE_SEARCH_URL = os.getenv("GOOGLE_SEARCH_URL", "https://www.googleapis.com/customsearch/v1")
 
     # GPT setting environment variables
+    MODEL = "gpt-4o-mini"
     TEMPERATURE = 0.5
     MAX_TOKENS = 500
     FREQUENCY_PENALTY = 0
     PRESENCE_PENALTY = 0.6
-    MAX_CONTEXT_QUESTIONS = 10
 
-    # Scraping limitation.
+    # Chat history context: messages considered, prompt token budget and per-message cap
+    MAX_CONTEXT_MESSAGES = 50
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+    MAX_TURN_TOKENS = int(os.getenv("MAX_TURN_TOKENS", "600"))
+
+    # Stream /gpt answers by progressively editing one message
+    STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "false").lower() in ("1", "true", "yes")
+    STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "1.0"))
+
+    # Scraping limitation: characters kept and bytes downloaded per page
     PAGE_LIMIT = 1500
+    MAX_PAGE_BYTES = int(os.getenv("MAX_PAGE_BYTES", str(1024 * 1024)))
+
+    # Page parsing workers: 0 parses on the event loop, otherwise 'process' or 'thread' workers
+    PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+    PARSE_WORKER_TYPE = os.getenv("PARSE_WORKER_TYPE", "process").lower()
+    PARSE_MAX_PENDING = int(os.getenv("PARSE_MAX_PENDING", "32"))
+
+    # Web search: results requested, pages needed before answering early and HTTP limits.
+    # SEARCH_MIN_PAGES=0 waits for every result page (each bounded by FETCH_TIMEOUT), so that
+    # passages are ranked across all pages; a lower number answers sooner from fewer pages.
+    SEARCH_RESULTS = int(os.getenv("SEARCH_RESULTS", "5"))
+    SEARCH_MIN_PAGES = int(os.getenv("SEARCH_MIN_PAGES", "0"))
+    FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "5"))
+    MAX_CONNECTIONS = 100
+    MAX_CONNECTIONS_PER_HOST = 2
+
+    # Characters of ranked page passages included in a search answer prompt
+    SEARCH_CONTEXT_CHARS = int(os.getenv("SEARCH_CONTEXT_CHARS", "3000"))
+
+    # Search cache: lifetime of search responses and pages, and total size limit
+    SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "86400"))
+    PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "86400"))
+    SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+    # GPT request scheduling: concurrent calls overall and per user, and waiting calls per user
+    GPT_MAX_CONCURRENT = int(os.getenv("GPT_MAX_CONCURRENT", "8"))
+    GPT_MAX_PER_USER = int(os.getenv("GPT_MAX_PER_USER", "1"))
+    GPT_MAX_QUEUED_PER_USER = int(os.getenv("GPT_MAX_QUEUED_PER_USER", "3"))
+    BUSY_MESSAGE = "⚠️ You have too many requests in progress. Please wait for the previous answers."
+
+    # OpenAI rate limits (updated from response headers) and retries of transient errors
+    OPENAI_REQUESTS_PER_MINUTE = float(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500"))
+    OPENAI_TOKENS_PER_MINUTE = float(os.getenv("OPENAI_TOKENS_PER_MINUTE", "200000"))
+    OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+
+    # Cache of /gpt answers: entries, lifetime and similarity of a near-match (0 disables near-matches)
+    RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+    RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+    RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0"))
+    NO_CACHE_FLAG = "--no-cache"
 
     # Initiaulize chat history databases
     init_user_db()
@@ -48,35 +102,196 @@ class GPT_Agent:
     MAKRDOWN_PROMPT: str = load_prompt(os.path.join(_base_path, "telegram_markdownV2.txt"))
     KEYWORD_PROMPT: str = load_prompt(os.path.join(_base_path, "keyword_extraction.txt"))
 
-    def __init__(self):
+    def __init__(self, client: openai.AsyncOpenAI = None):
         """
         Initializes the GPT_Agent instance.
 
         This constructor ensures that the OpenAI API key is available and
         sets up the OpenAI API client.
 
+        Args:
+            client (openai.AsyncOpenAI, optional): Client used instead of the default OpenAI client,
+                                                   e.g. a fake client in tests.
+
         Raises:
             ValueError: If the OpenAI API key is not found in the environment variables.
         """
-        if not self.OPENAI_API_KEY:
-            self.logger.error("OPENAI_API_KEY is not set in the environment variables.")
-            raise ValueError("Missing OpenAI API Key")
-
-        self.client = openai.AsyncOpenAI(api_key=self.OPENAI_API_KEY)
+        if client is None:
+            if not self.OPENAI_API_KEY:
+                self.logger.error("OPENAI_API_KEY is not set in the environment variables.")
+                raise ValueError("Missing OpenAI API Key")
+            # Retries are handled by the rate limiter, which shares backoff between requests
+            client = openai.AsyncOpenAI(api_key=self.OPENAI_API_KEY, max_retries=0)
+
+        self.client = client
+        self._session: aiohttp.ClientSession = None
+        self.search_cache = SearchCache(
+            search_ttl=self.SEARCH_CACHE_TTL,
+            page_ttl=self.PAGE_CACHE_TTL,
+            max_bytes=self.SEARCH_CACHE_MAX_BYTES
+        )
+        self.scheduler = RequestScheduler(
+            max_concurrent=self.GPT_MAX_CONCURRENT,
+            max_per_user=self.GPT_MAX_PER_USER,
+            max_queued_per_user=self.GPT_MAX_QUEUED_PER_USER
+        )
+        self.rate_limiter = RateLimiter(
+            requests_per_minute=self.OPENAI_REQUESTS_PER_MINUTE,
+            tokens_per_minute=self.OPENAI_TOKENS_PER_MINUTE,
+            is_retryable=self._is_retryable,
+            max_retries=self.OPENAI_MAX_RETRIES,
+            breaker=CircuitBreaker(self.CIRCUIT_FAILURE_THRESHOLD, self.CIRCUIT_RESET_TIMEOUT)
+        )
+        self.response_cache: ResponseCache = None
+        if self.RESPONSE_CACHE_SIZE > 0:
+            self.response_cache = ResponseCache(
+                max_entries=self.RESPONSE_CACHE_SIZE,
+                ttl=self.RESPONSE_CACHE_TTL,
+                similarity_threshold=self.RESPONSE_CACHE_SIMILARITY
+            )
+        self.parse_pool: ParsePool = None
+        if self.PARSE_WORKERS > 0:
+            self.parse_pool = ParsePool(
+                workers=self.PARSE_WORKERS,
+                max_pending=self.PARSE_MAX_PENDING,
+                use_processes=self.PARSE_WORKER_TYPE == "process"
+            )
         self.logger.info("GPT_Agent initialized successfully.")
 
-    async def _get_response(self, system_prompt: str, user_prompt: str) -> str:
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Returns the HTTP session shared by all web requests, creating it on first use.
+
+        The session pools connections, limits concurrent connections per host
+        and applies a timeout to every request.
+
+        Returns:
+            aiohttp.ClientSession: The shared HTTP session.
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.MAX_CONNECTIONS,
+                limit_per_host=self.MAX_CONNECTIONS_PER_HOST,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.FETCH_TIMEOUT)
+            )
+        return self._session
+
+    async def close(self):
+        """
+        Closes the shared HTTP session, the search cache and the parse workers.
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            self.logger.info("GPT_Agent HTTP session closed.")
+        self.search_cache.close()
+        if self.parse_pool is not None:
+            self.parse_pool.shutdown()
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """
+        Tells whether a failed OpenAI request is worth retrying.
+
+        Args:
+            error (Exception): Error raised by the OpenAI client.
+
+        Returns:
+            bool: True for rate limits, timeouts, connection and server errors.
+        """
+        if isinstance(error, openai.RateLimitError):
+            # An exhausted quota does not recover by waiting
+            return getattr(error, "code", None) != "insufficient_quota"
+        if isinstance(error, openai.APIConnectionError):
+            return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in (408, 409) or error.status_code >= 500
+        return False
+
+    def _model_params(self) -> dict:
+        """
+        Returns the model settings sent with every chat completion request.
+        """
+        return {
+            "model": self.MODEL,
+            "temperature": self.TEMPERATURE,
+            "max_tokens": self.MAX_TOKENS,
+            "top_p": 1,
+            "frequency_penalty": self.FREQUENCY_PENALTY,
+            "presence_penalty": self.PRESENCE_PENALTY,
+        }
+
+    async def _create_completion(self, messages: list[dict[str, str]], stream: bool = False):
+        """
+        Sends a chat completion request with the agent's model settings.
+
+        The request waits for the request and token rate limits, is retried on
+        transient errors and updates the limits from the response headers.
+
+        Args:
+            messages (list[dict[str, str]]): Messages for the chat completion API.
+            stream (bool): Return an asynchronous stream of chunks instead of the full completion.
+
+        Returns:
+            The chat completion, or an asynchronous stream of completion chunks.
+        """
+        estimated_tokens = sum(estimate_tokens(message["content"]) for message in messages) + self.MAX_TOKENS
+        params = dict(self._model_params(), messages=messages, stream=stream)
+
+        async def send():
+            completions = self.client.chat.completions
+            raw_completions = getattr(completions, "with_raw_response", None)
+            # A streamed request is measured until the response headers arrive
+            async with track("openai", "chat.completions"):
+                if raw_completions is None:
+                    return await completions.create(**params)
+                raw_response = await raw_completions.create(**params)
+            self.rate_limiter.update_from_headers(raw_response.headers)
+            return raw_response.parse()
+
+        response = await self.rate_limiter.call(send, estimated_tokens)
+
+        # Settle the token bucket with the tokens actually used
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.rate_limiter.tokens.adjust(usage.total_tokens - estimated_tokens)
+        return response
+
+    async def _schedule_completion(self, messages: list[dict[str, str]], user_id: int):
+        """
+        Sends a chat completion request through the request scheduler.
+
+        Identical requests that are still in progress share one API call.
+
+        Args:
+            messages (list[dict[str, str]]): Messages for the chat completion API.
+            user_id (int): Unique identifier of the user the request is made for.
+
+        Returns:
+            The chat completion.
+
+        Raises:
+            SchedulerBusyError: If the user already has too many requests waiting.
+        """
+        key = hashlib.sha256(json.dumps(messages, ensure_ascii=False).encode("utf-8")).hexdigest()
+        return await self.scheduler.submit(user_id, key, lambda: self._create_completion(messages))
+
+    async def _get_response(self, system_prompt: str, user_prompt: str, user_id: int = None) -> str:
         """
         Generates a response from the GPT API.
 
         Args:
             system_prompt (str): Instruction for the GPT model.
             user_prompt (str): User's input message.
+            user_id (int, optional): Unique identifier of the user the request is made for.
 
         Returns:
             str: GPT-generated response.
         """
-        self.logger.info(f"Generating GPT response for prompt")
+        self.logger.info("Generating GPT response for prompt")
 
         messages = [
             {"role": "system", "content": system_prompt}
@@ -85,21 +300,86 @@ class GPT_Agent:
         messages.append({"role": "user", "content": user_prompt})
 
         try:
-            response = await self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                temperature=self.TEMPERATURE,
-                max_tokens=self.MAX_TOKENS,
-                top_p=1,
-                frequency_penalty=self.FREQUENCY_PENALTY,
-                presence_penalty=self.PRESENCE_PENALTY,
-            )
-            self.logger.info("GPT response generated successfully.")
+            response = await self._schedule_completion(messages, user_id)
+            self._log_usage(response)
             return response.choices[0].message.content
+        except SchedulerBusyError as e:
+            self.logger.warning("GPT request rejected: %s", e)
+            return self.BUSY_MESSAGE
         except Exception as e:
-            self.logger.error(f"GPT response generation error: {e}")
+            self.logger.error("GPT response generation error: %s", e)
             return f"⚠️ GPT response generation error: {e}"
 
+    async def _get_streamed_response(self, system_prompt: str, user_prompt: str, streamer: StreamingMessage, user_id: int = None) -> str:
+        """
+        Generates a response from the GPT API and shows it while it is being generated.
+
+        The request holds its scheduler slot until the whole stream has been received.
+
+        Args:
+            system_prompt (str): Instruction for the GPT model.
+            user_prompt (str): User's input message.
+            streamer (StreamingMessage): Telegram message that is progressively edited.
+            user_id (int, optional): Unique identifier of the user the request is made for.
+
+        Returns:
+            str: GPT-generated response.
+        """
+        self.logger.info("Generating streamed GPT response for prompt")
+
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+        async def consume_stream():
+            stream = await self._create_completion(messages, stream=True)
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    await streamer.append(chunk.choices[0].delta.content)
+
+        try:
+            await streamer.start()
+            await self.scheduler.submit(user_id, None, consume_stream)
+            await streamer.finish()
+            self.logger.info("Streamed GPT response generated successfully.")
+            return streamer.text
+        except SchedulerBusyError as e:
+            self.logger.warning("GPT request rejected: %s", e)
+            await streamer.finish(self.BUSY_MESSAGE)
+            return self.BUSY_MESSAGE
+        except Exception as e:
+            self.logger.error("GPT response generation error: %s", e)
+            error_text = f"⚠️ GPT response generation error: {e}"
+            if streamer.message is not None:
+                await streamer.finish(error_text)
+            else:
+                await send_message(update=streamer.update, context=streamer.context, text=error_text)
+            return error_text
+
+    def _log_usage(self, response, estimated_tokens: int = None):
+        """
+        Logs the tokens reported by the GPT API for a completed request.
+
+        Args:
+            response: Chat completion returned by the OpenAI client.
+            estimated_tokens (int, optional): Locally estimated prompt tokens.
+        """
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            self.logger.info("GPT response generated successfully.")
+            return
+        if estimated_tokens is None:
+            self.logger.info(
+                "GPT response generated successfully. Tokens used: prompt=%s, completion=%s, total=%s",
+                usage.prompt_tokens, usage.completion_tokens, usage.total_tokens
+            )
+            return
+        self.logger.info(
+            "GPT response generated successfully. Tokens used: prompt=%s (estimated %s), completion=%s, total=%s",
+            usage.prompt_tokens, estimated_tokens, usage.completion_tokens, usage.total_tokens
+        )
+
     async def _get_response_chat_history(self, system_prompt: str, user_prompt: str, user_id: int, username: str) -> str:
         """
         Generates a response from the GPT API, including previous chat history.
@@ -113,120 +393,213 @@ class GPT_Agent:
         Returns:
             str: GPT-generated response.
         """
-        self.logger.info(f"Generating GPT response for user ({username}): {user_prompt}")
+        self.logger.info("Generating GPT response for user (%s): %.80s", username, user_prompt, extra={"user_id": user_id})
 
         # Fetch previous chat history from the database
-        chat_history = load_messages(user_id, username)
-        
-        # Prepare message format for GPT API
-        messages = [{"role": "system", "content": system_prompt}]
+        chat_history = await async_chat_database.load_recent_messages(user_id, username, self.MAX_CONTEXT_MESSAGES)
 
-        # Process chat history and add it as context
+        # Process chat history into the message format of the GPT API
         previous_questions_and_answers = []
-        for record in chat_history[-self.MAX_CONTEXT_QUESTIONS:]:  # Keep only the most recent context messages
+        for record in chat_history:
             question, sender, message, timestamp = record
             if sender == "user":
                 previous_questions_and_answers.append({"role": "user", "content": message})
             elif sender == "bot":
                 previous_questions_and_answers.append({"role": "assistant", "content": message})
 
-        # Append processed history
-        messages.extend(previous_questions_and_answers)
-
-        # Append new user question
-        messages.append({"role": "user", "content": user_prompt})
+        # Keep only the most recent messages that fit into the token budget
+        messages, estimated_tokens = build_context(
+            system_prompt,
+            previous_questions_and_answers,
+            user_prompt,
+            token_budget=self.CONTEXT_TOKEN_BUDGET,
+            max_turn_tokens=self.MAX_TURN_TOKENS
+        )
+        self.logger.info(
+            "Built GPT context for user (%s) with %d history messages and ~%d prompt tokens.",
+            username, len(messages) - 2, estimated_tokens
+        )
 
         try:
-            response = await self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                temperature=self.TEMPERATURE,
-                max_tokens=self.MAX_TOKENS,
-                top_p=1,
-                frequency_penalty=self.FREQUENCY_PENALTY,
-                presence_penalty=self.PRESENCE_PENALTY,
-            )
-            self.logger.info("GPT response generated successfully.")
+            response = await self._schedule_completion(messages, user_id)
+            self._log_usage(response, estimated_tokens)
             return response.choices[0].message.content
+        except SchedulerBusyError as e:
+            self.logger.warning("GPT request rejected: %s", e)
+            return self.BUSY_MESSAGE
         except Exception as e:
-            self.logger.error(f"GPT response generation error: {e}")
+            self.logger.error("GPT response generation error: %s", e)
             return f"⚠️ GPT response generation error: {e}"
 
+    async def _search_cache_call(self, func, *args):
+        """
+        Runs a search cache method in a worker thread and measures it.
+
+        Args:
+            func (Callable): Method of the search cache.
+            *args: Arguments passed to the method.
+
+        Returns:
+            Any: The return value of the method.
+        """
+        async with track("search_cache", func.__name__):
+            return await asyncio.to_thread(func, *args)
+
     async def _fetch_page_content(self, url: str) -> str:
         """
         Fetches the content of a web page and extracts the main text.
 
+        Extracted text is cached by URL. Fresh entries are returned without a
+        request; stale entries are revalidated with their ETag/Last-Modified
+        validators and reused when the server answers 304 Not Modified.
+
         Args:
             url (str): The URL of the web page.
 
         Returns:
             str: Extracted text from the page.
+
+        Raises:
+            Exception: If the page cannot be downloaded.
         """
-        self.logger.info(f"Fetching page content from URL: {url}")
-        try:
-            async with aiohttp.self.clientSession() as session:
-                async with session.get(url) as resp:
-                    html = await resp.text()
+        cached = await self._search_cache_call(self.search_cache.get_page, url)
+        if cached is not None and cached["fresh"]:
+            self.logger.info("Using cached page content for URL: %s", url)
+            return cached["content"]
+
+        headers = {}
+        if cached is not None:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        self.logger.info("Fetching page content from URL: %s", url)
+        async with track("web", "fetch_page"):
+            async with self._get_session().get(url, headers=headers) as resp:
+                not_modified = cached is not None and resp.status == 304
+                if not not_modified:
+                    resp.raise_for_status()
+                    etag = resp.headers.get("ETag")
+                    last_modified = resp.headers.get("Last-Modified")
+
+                    if self.parse_pool is not None:
+                        # Download the capped body, then parse it in a worker off the event loop
+                        body = await read_body(resp, self.MAX_PAGE_BYTES)
+                        page_text = await self.parse_pool.extract_text(body, resp.charset, self.PAGE_LIMIT)
+                    else:
+                        # Parse paragraphs while downloading and stop once enough text is collected
+                        page_text = await extract_paragraphs(resp, self.PAGE_LIMIT, self.MAX_PAGE_BYTES)
+
+        if not_modified:
+            await self._search_cache_call(self.search_cache.touch_page, url)
+            self.logger.info("Cached page content is still valid for URL: %s", url)
+            return cached["content"]
+
+        await self._search_cache_call(self.search_cache.put_page, url, page_text, etag, last_modified)
+        self.logger.info("Successfully fetched content from %s", url)
+        return page_text
+
+    async def _fetch_search_result(self, rank: int, result: dict) -> dict:
+        """
+        Fetches the page of a single search result.
 
-            soup = BeautifulSoup(html, "html.parser")
-            paragraphs = soup.find_all("p")
-            page_text = "\n".join([para.get_text() for para in paragraphs])
+        Args:
+            rank (int): Position of the result in the search response.
+            result (dict): Search result item with 'title' and 'link'.
 
-            self.logger.info(f"Successfully fetched content from {url}")
-            return page_text[:self.PAGE_LIMIT]
+        Returns:
+            dict: Search result with its page content and fetch status.
+        """
+        url = result["link"]
+        try:
+            content = await self._fetch_page_content(url)
+            status = "success" if content.strip() else "error"
         except Exception as e:
-            self.logger.error(f"Failed to load page content from {url}: {e}")
-            return f"⚠️ Fail to load page content: {e}"
+            self.logger.error("Failed to load page content from %s: %s", url, e)
+            content, status = f"⚠️ Fail to load page content: {e}", "error"
+        return {
+            "rank": rank,
+            "status": status,
+            "title": result["title"],
+            "link": url,
+            "content": content
+        }
 
     async def _web_search(self, query: str) -> list[dict[str, str]]:
         """
         Uses Google Custom Search API to perform a real web search and fetch page content.
 
+        Result pages are fetched concurrently and every page that loads within
+        `FETCH_TIMEOUT` is returned, so the answer ranks passages from all of
+        them. If `SEARCH_MIN_PAGES` is set, the remaining downloads are
+        cancelled as soon as that many pages have content: latency is then
+        bounded by the slowest page that is actually needed, at the cost of
+        ranking passages from fewer pages.
+
         Args:
             query (str): The search query.
 
         Returns:
-            list[dict[str, str]]: Search results with page content.
+            list[dict[str, str]]: Search results with page content, in search ranking order.
         """
-        self.logger.info(f"Performing web search for query: {query}")
+        self.logger.info("Performing web search for query: %s", query)
         params = {
             "key": self.GOOGLE_API_KEY,
             "cx": self.GOOGLE_CX_ID,
             "q": query,
-            "num": 5
+            "num": self.SEARCH_RESULTS
         }
 
         try:
-            async with aiohttp.self.clientSession() as session:
-                async with session.get(self.GOOGLE_SEARCH_URL, params=params) as resp:
-                    data = await resp.json()
-
-            if "items" in data:
-                results = data["items"]
-                output = []
-                for res in results:
-                    title = res['title']
-                    url = res['link']
-                    content = await self._fetch_page_content(url)
-                    output.append({
-                        "status": "success",
-                        "title": title, 
-                        "link": url, 
-                        "content": content
-                    })
-
-                self.logger.info(f"Web search completed with {len(results)} results.")
-                return output
+            data = await self._search_cache_call(self.search_cache.get_search, query)
+            if data is not None:
+                self.logger.info("Using cached search results for query: %s", query)
             else:
+                async with track("google", "custom_search"):
+                    async with self._get_session().get(self.GOOGLE_SEARCH_URL, params=params) as resp:
+                        data = await resp.json()
+                if "items" in data:
+                    items = [{"title": res["title"], "link": res["link"]} for res in data["items"]]
+                    await self._search_cache_call(self.search_cache.put_search, query, {"items": items})
+
+            if "items" not in data:
                 self.logger.warning("No search results found.")
                 return [{
-                    "status": "error", 
+                    "status": "error",
                     "content": "No search results found."
                 }]
+
+            tasks = [
+                asyncio.create_task(self._fetch_search_result(rank, res))
+                for rank, res in enumerate(data["items"])
+            ]
+            output = []
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    result = await next_done
+                    if result["status"] == "success":
+                        output.append(result)
+                        if self.SEARCH_MIN_PAGES and len(output) >= self.SEARCH_MIN_PAGES:
+                            break
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+            if not output:
+                self.logger.warning("No search result page could be loaded.")
+                return [{
+                    "status": "error",
+                    "content": "No search result page could be loaded."
+                }]
+
+            output.sort(key=lambda result: result["rank"])
+            self.logger.info("Web search completed with %d of %d result pages.", len(output), len(tasks))
+            return output
         except Exception as e:
-            self.logger.error(f"Failed to search content: {e}")
+            self.logger.error("Failed to search content: %s", e)
             return [{
-                "status": "error", 
+                "status": "error",
                 "content": f"⚠️ Fail to search content: {e}"
             }]
 
@@ -238,21 +611,50 @@ class GPT_Agent:
             update (Update): Telegram update object.
             context (ContextTypes.DEFAULT_TYPE): Telegram bot context.
         """
+        start = time.perf_counter()
         user = update.effective_user
+        log_fields = {"user_id": user.id, "handler": "gpt"}
         user_prompt = update.message.text.replace("/gpt", "") # Exception of command keyword
+
+        # '/gpt --no-cache <question>' always asks the model
+        use_cache = self.response_cache is not None
+        if user_prompt.strip().startswith(self.NO_CACHE_FLAG):
+            user_prompt = user_prompt.strip()[len(self.NO_CACHE_FLAG):]
+            use_cache = False
         
-        self.logger.info(f"Received GPT request from '{user.username}' (ID: {user.id}): {user_prompt}")
+        self.logger.info("Received GPT request from '%s' (ID: %s): %.80s", user.username, user.id, user_prompt, extra=log_fields)
 
         # Exception of the blank response
         if not user_prompt.strip():
-            self.logger.warning(f"Empty GPT request from '{user.username}' (ID: {user.id})")
+            self.logger.warning("Empty GPT request from '%s' (ID: %s)", user.username, user.id, extra=log_fields)
             await send_message(update=update, context=context, text="⚠️ Please provide a valid question.")
             return
 
-        response_text: str = await self._get_response(self.MAKRDOWN_PROMPT, user_prompt)
+        cache_context = response_context_key(self.MAKRDOWN_PROMPT, self._model_params())
+        if use_cache:
+            cached_text = self.response_cache.get(cache_context, user_prompt)
+            if cached_text is not None:
+                await send_message(update=update, context=context, text=cached_text)
+                self.logger.info(
+                    "Sent cached response to '%s' (ID: %s): %.50s...", user.username, user.id, cached_text,
+                    extra={**log_fields, "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+                )
+                return
+
+        if self.STREAM_RESPONSES:
+            streamer = StreamingMessage(update, context, edit_interval=self.STREAM_EDIT_INTERVAL)
+            response_text: str = await self._get_streamed_response(self.MAKRDOWN_PROMPT, user_prompt, streamer, user.id)
+        else:
+            response_text: str = await self._get_response(self.MAKRDOWN_PROMPT, user_prompt, user.id)
+            await send_message(update=update, context=context, text=response_text)
+        self.logger.info(
+            "Sent GPT response to '%s' (ID: %s): %.50s...", user.username, user.id, response_text,
+            extra={**log_fields, "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+        )
 
-        self.logger.info(f"Sending callback response to '{user.username}' (ID: {user.id}): {response_text[:50]}...")
-        await send_message(update=update, context=context, text=response_text)
+        # Error messages are not cached so that the question is retried next time
+        if self.response_cache is not None and not response_text.startswith("⚠️"):
+            self.response_cache.set(cache_context, user_prompt, response_text)
 
     async def search_response(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
@@ -262,20 +664,22 @@ class GPT_Agent:
             update (Update): Telegram update object.
             context (ContextTypes.DEFAULT_TYPE): Telegram bot context.
         """
+        start = time.perf_counter()
         user = update.effective_user
+        log_fields = {"user_id": user.id, "handler": "search"}
         user_prompt = update.message.text.replace("/search", "") # Exception of command keyword
         
-        self.logger.info(f"Received GPT request from '{user.username}' (ID: {user.id}): {user_prompt}")
+        self.logger.info("Received search request from '%s' (ID: %s): %.80s", user.username, user.id, user_prompt, extra=log_fields)
 
         # Exception of the blank response
         if not user_prompt.strip():
-            self.logger.warning(f"Empty GPT request from '{user.username}' (ID: {user.id})")
+            self.logger.warning("Empty search request from '%s' (ID: %s)", user.username, user.id, extra=log_fields)
             await send_message(update=update, context=context, text="⚠️ Please provide a valid question.")
             return
 
-        keyword: str = await self._get_response(self.KEYWORD_PROMPT, user_prompt)
+        keyword: str = await self._get_response(self.KEYWORD_PROMPT, user_prompt, user.id)
 
-        self.logger.info(f"Extracted keyword '{keyword}' from '{user.username}' (ID: {user.id})")
+        self.logger.info("Extracted keyword '%s' from '%s' (ID: %s)", keyword, user.username, user.id, extra=log_fields)
 
         keyboard = [[
             InlineKeyboardButton("🔎 Yes", callback_data="gpt_yes_search"),
@@ -290,6 +694,10 @@ class GPT_Agent:
             text=f"🔍 Search for `{keyword}`?", 
             reply_markup=reply_markup
         )
+        self.logger.info(
+            "Sent search confirmation to '%s' (ID: %s)", user.username, user.id,
+            extra={**log_fields, "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+        )
 
     async def handle_callback_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
@@ -299,13 +707,15 @@ class GPT_Agent:
             update (Update): Telegram update object.
             context (ContextTypes.DEFAULT_TYPE): Telegram bot context.
         """
+        start = time.perf_counter()
         query = update.callback_query
         await query.answer()
 
         user = update.effective_user
+        log_fields = {"user_id": user.id, "handler": "search_callback"}
         user_prompt = context.user_data.get('question', '')
 
-        self.logger.info(f"Callback query '{query.data}' received from '{user.username}' (ID: {user.id})")
+        self.logger.info("Callback query '%s' received from '%s' (ID: %s)", query.data, user.username, user.id, extra=log_fields)
 
         # Click 'Yes' button
         if query.data == "gpt_yes_search":
@@ -313,10 +723,12 @@ class GPT_Agent:
 
             # Success for web searching
             if search_result[0]["status"] == "success":
+                # Keep the passages of all fetched pages that best match the question
+                content = pack_passages(user_prompt, search_result, self.SEARCH_CONTEXT_CHARS)
                 system_prompt: str = f"""\
 {self.MAKRDOWN_PROMPT}
 Explain about the following contents:
-<Content>{search_result[0]['content']}</Content>
+<Content>{content}</Content>
 
 Think step-by-step before responding.
 Response by the following format:
@@ -340,8 +752,12 @@ Think step-by-step before responding.
             response_text = await self._get_response_chat_history(system_prompt, user_prompt, user.id, user.username)
 
         # Save chat history
-        save_message(user.id, user.username, "user", user_prompt)
-        save_message(user.id, user.username, "bot", response_text)
-        self.logger.info(f"Sending callback response to '{user.username}' (ID: {user.id}): {response_text[:50]}...")
-
-        await send_message(update=update, context=context, text=response_text)
\ No newline at end of file
+        await async_chat_database.save_messages([
+            (user.id, user.username, "user", user_prompt),
+            (user.id, user.username, "bot", response_text)
+        ])
+        await send_message(update=update, context=context, text=response_text)
+        self.logger.info(
+            "Sent callback response to '%s' (ID: %s): %.50s...", user.username, user.id, response_text,
+            extra={**log_fields, "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+        )
\ No newline at end of file
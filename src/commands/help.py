@@ -26,7 +26,7 @@ async def help(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
 
     # Log the help command request
-    logger.info(f"Help command requested by user '{user.username}' (ID: {user.id}) in chat ID: {chat_id}")
+    logger.info("Help command requested by user '%s' (ID: %s) in chat ID: %s", user.username, user.id, chat_id)
 
     # Send help message with available commands
     await send_message(
@@ -32,14 +32,14 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # Check if the user has already started the bot
     if user.id in started_users:
-        logger.info(f"User '{user.username}' (ID: {user.id}) already started the bot before.")
+        logger.info("User '%s' (ID: %s) already started the bot before.", user.username, user.id)
         return
 
     # Add the user to the set of started users
     started_users.add(user.id)
 
     # Log the user interaction
-    logger.info(f"Bot started for the first time by user '{user.username}' (ID: {user.id}) in chat ID: {chat_id}")
+    logger.info("Bot started for the first time by user '%s' (ID: %s) in chat ID: %s", user.username, user.id, chat_id)
 
     # Send a welcome message to the user
     await send_message(
@@ -26,7 +26,7 @@ async def unknown(update: Update, context: ContextTypes.DEFAULT_TYPE):
     command = update.message.text if update.message else "Unknown command"
 
     # Log the unrecognized command along with user details
-    logger.info(f"Unknown command received from user '{user.username}' (ID: {user.id}): {command}")
+    logger.info("Unknown command received from user '%s' (ID: %s): %s", user.username, user.id, command)
 
     # Send a reply to the user
     await send_message(
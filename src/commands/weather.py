@@ -1,21 +1,112 @@
 from telegram import Update
 from telegram.ext import ContextTypes
 
-import requests
+import aiohttp
+import asyncio
 from dotenv import load_dotenv
 import logging
 import os
+import time
 
-from tools import send_message, setup_logger
+from tools import send_message, setup_logger, TTLCache, track
 
 # Load environment variables
 load_dotenv(dotenv_path="../.env")
 API_KEY = os.getenv("OPENWEATHERMAP_API_KEY")
+WEATHER_URL = os.getenv("WEATHER_URL", "http://api.openweathermap.org/data/2.5/weather")
+
+# Request timeout and cache lifetimes (seconds) of found and unknown cities
+REQUEST_TIMEOUT = float(os.getenv("WEATHER_TIMEOUT", "5"))
+CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "600"))
+NEGATIVE_CACHE_TTL = float(os.getenv("WEATHER_NEGATIVE_CACHE_TTL", "300"))
 
 # Initialize the logger configuration
 setup_logger()
 logger = logging.getLogger(__name__)
 
+# Shared HTTP session, weather responses per city and lookups in progress
+_session: aiohttp.ClientSession = None
+_cache = TTLCache(max_entries=1000, ttl=CACHE_TTL)
+_in_flight: dict[str, asyncio.Task] = {}
+
+
+def _get_session() -> aiohttp.ClientSession:
+    """
+    Returns the pooled HTTP session used for weather requests, creating it on first use.
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT))
+    return _session
+
+
+async def close_weather_session():
+    """
+    Closes the HTTP session used for weather requests.
+    """
+    if _session is not None and not _session.closed:
+        await _session.close()
+
+
+def weather_cache_stats() -> dict[str, int]:
+    """
+    Returns the hit/miss counters and size of the weather cache.
+    """
+    return _cache.stats()
+
+
+async def _request_weather(city: str, key: str) -> tuple[int, dict]:
+    """
+    Calls the OpenWeatherMap API and caches the result.
+
+    Successful responses are cached for `CACHE_TTL` seconds and unknown
+    cities for `NEGATIVE_CACHE_TTL` seconds. Other errors are not cached.
+
+    Args:
+        city (str): City name as given by the user.
+        key (str): Normalized city name used as cache key.
+
+    Returns:
+        tuple[int, dict]: HTTP status code and response body.
+    """
+    params = {"q": city, "appid": API_KEY, "units": "metric"}
+    async with track("openweathermap", "weather"):
+        async with _get_session().get(WEATHER_URL, params=params) as response:
+            data = await response.json(content_type=None)
+            status = response.status
+
+    if status == 200:
+        _cache.set(key, (status, data))
+    elif status == 404:
+        _cache.set(key, (status, data), ttl=NEGATIVE_CACHE_TTL)
+    return status, data
+
+
+async def _get_weather(city: str) -> tuple[int, dict]:
+    """
+    Returns the current weather of a city, from the cache when possible.
+
+    Concurrent lookups of the same city share a single upstream request.
+
+    Args:
+        city (str): City name as given by the user.
+
+    Returns:
+        tuple[int, dict]: HTTP status code and response body.
+    """
+    key = " ".join(city.lower().split())
+    cached = _cache.get(key)
+    if cached is not None:
+        logger.info("Using cached weather data for city: %s", city)
+        return cached
+
+    task = _in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_request_weather(city, key))
+        _in_flight[key] = task
+        task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    return await asyncio.shield(task)
+
 
 async def weather(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
@@ -34,19 +125,21 @@ async def weather(update: Update, context: ContextTypes.DEFAULT_TYPE):
         - WARNING: When a city is not found or user provides no city name.
         - ERROR: When an error occurs during the API call or data processing.
     """
+    start = time.perf_counter()
     user = update.effective_user  # Get user information
     chat_id = update.effective_chat.id
+    log_fields = {"user_id": user.id, "chat_id": chat_id, "handler": "weather"}
 
     # Log the help command request
-    logger.info(f"Weather command requested by user '{user.username}' (ID: {user.id}) in chat ID: {chat_id}")
+    logger.info("Weather command requested by user '%s' (ID: %s) in chat ID: %s", user.username, user.id, chat_id, extra=log_fields)
 
     # Get the city name from the user input
     if context.args:
         city = " ".join(context.args)
-        logger.info(f"Received weather request for city: {city}")
+        logger.info("Received weather request for city: %s", city, extra=log_fields)
     else:
         warning_message = "No city provided by the user. Prompting for input."
-        logger.warning(warning_message)
+        logger.warning(warning_message, extra=log_fields)
 
         await send_message(
             update=update,
@@ -55,24 +148,22 @@ async def weather(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    # OpenWeatherMap API URL
-    url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={API_KEY}&units=metric"
-    logger.debug(f"API Request URL: {url}")  # Debug log to track the API URL
-
     try:
         # Call the API and get the response
-        response = requests.get(url)
-        data = response.json()
+        status_code, data = await _get_weather(city)
 
         # Check if the request was successful
-        if response.status_code == 200:
+        if status_code == 200:
             city_name = data["name"]
             weather_description = data["weather"][0]["description"]
             temperature = data["main"]["temp"]
             humidity = data["main"]["humidity"]
             wind_speed = data["wind"]["speed"]
 
-            logger.info(f"Successfully retrieved weather data for {city_name}")
+            logger.info(
+                "Successfully retrieved weather data for %s", city_name,
+                extra={**log_fields, "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+            )
 
             # Send weather information to the user via Telegram
             await send_message(
@@ -88,7 +179,7 @@ async def weather(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
         else:
             # If the city is not found
-            logger.warning(f"City not found: {city} (Status Code: {response.status_code})")
+            logger.warning("City not found: %s (Status Code: %s)", city, status_code, extra=log_fields)
             await send_message(
                 update=update,
                 context=context,
@@ -97,7 +188,7 @@ async def weather(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     except Exception as e:
         # Handle any exceptions during the API call
-        logger.error(f"Error retrieving weather data for {city}: {e}")
+        logger.error("Error retrieving weather data for %s: %s", city, e, extra=log_fields)
         await send_message(
             update=update,
             context=context,
@@ -3,4 +3,6 @@ from sys import path
 
 path.insert(0, dirname(__file__))
 
-from .chat_database import init_user_db, save_message, load_messages, delete_messages
\ No newline at end of file
+from .chat_database import init_user_db, save_message, save_messages, load_messages, load_recent_messages, delete_messages, cache_stats, close_connections
+from . import async_chat_database
+from .search_cache import SearchCache
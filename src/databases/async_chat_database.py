@@ -0,0 +1,231 @@
+"""
+Awaitable counterparts of the chat history functions.
+
+Every call is executed on one dedicated database thread, so SQLite disk I/O
+never blocks the asyncio event loop that dispatches Telegram updates.
+Message writes are group-committed: writes from many conversations that
+arrive within a few milliseconds share a single transaction. Recent history
+is answered straight from the in-memory history cache when the user has no
+write still in flight.
+"""
+import asyncio
+import concurrent.futures
+import threading
+import queue
+import logging
+import os
+from tools import setup_logger, track
+from . import chat_database
+from .write_buffer import WriteBuffer
+
+# Initialize logger configuration
+setup_logger()
+logger = logging.getLogger(__name__)
+
+# Maximum number of pending database jobs before callers are made to wait
+_MAX_QUEUE_SIZE = int(os.getenv("CHAT_DB_QUEUE_SIZE", "1000"))
+
+# Delay between retries while the job queue is full
+_BACKPRESSURE_DELAY = 0.005
+
+# Group commit settings: maximum wait of a buffered write and rows per commit
+_FLUSH_INTERVAL = float(os.getenv("CHAT_DB_FLUSH_INTERVAL_MS", "5")) / 1000
+_FLUSH_MAX_ROWS = int(os.getenv("CHAT_DB_FLUSH_MAX_ROWS", "500"))
+
+
+class _DatabaseWorker(threading.Thread):
+    """
+    Background thread that executes queued database jobs one at a time.
+
+    Writes are collected in a `WriteBuffer` and committed together. Any other
+    job flushes the buffer first, so reads always see earlier writes.
+    """
+
+    def __init__(self, max_queue_size: int):
+        super().__init__(name="chat-database-worker", daemon=True)
+        self.jobs: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self.buffer = WriteBuffer(flush_interval=_FLUSH_INTERVAL, max_rows=_FLUSH_MAX_ROWS)
+
+    def run(self):
+        while True:
+            try:
+                job = self.jobs.get(timeout=self.buffer.time_until_due())
+            except queue.Empty:
+                self.buffer.flush()
+                continue
+
+            if job is None:
+                self.buffer.flush()
+                break
+
+            func, args, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            if func is chat_database.save_messages:
+                self.buffer.add(*args, future)
+                if self.buffer.is_full():
+                    self.buffer.flush()
+                continue
+
+            self.buffer.flush()
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                logger.error("Chat database job '%s' failed: %s", func.__name__, e)
+                future.set_exception(e)
+
+
+_worker: _DatabaseWorker = None
+_worker_lock = threading.Lock()
+
+# Number of queued writes per user. The history cache is only read directly
+# for users without pending writes, so a reader never misses its own write.
+_pending_writes: dict[int, int] = {}
+
+
+def _get_worker() -> _DatabaseWorker:
+    """
+    Returns the running database worker, starting it on first use.
+    """
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = _DatabaseWorker(_MAX_QUEUE_SIZE)
+            _worker.start()
+            logger.info("Chat database worker has been started.")
+        return _worker
+
+
+async def _run(func, *args):
+    """
+    Queues a database job and waits for its result without blocking the event loop.
+
+    When the queue is full the caller yields to the event loop until a slot
+    becomes free, which applies backpressure to busy handlers only.
+
+    Args:
+        func (Callable): Synchronous chat database function.
+        *args: Arguments passed to the function.
+
+    Returns:
+        Any: The return value of the function.
+    """
+    worker = _get_worker()
+    future = concurrent.futures.Future()
+    # Measured as the handler sees it: waiting for the queue and the worker included
+    async with track("sqlite", func.__name__):
+        while True:
+            try:
+                worker.jobs.put_nowait((func, args, future))
+                break
+            except queue.Full:
+                await asyncio.sleep(_BACKPRESSURE_DELAY)
+        return await asyncio.wrap_future(future)
+
+
+async def _run_write(user_ids: set[int], func, *args):
+    """
+    Queues a job that modifies the history of the given users.
+
+    Args:
+        user_ids (set[int]): Users whose history is modified.
+        func (Callable): Synchronous chat database function.
+        *args: Arguments passed to the function.
+
+    Returns:
+        Any: The return value of the function.
+    """
+    for user_id in user_ids:
+        _pending_writes[user_id] = _pending_writes.get(user_id, 0) + 1
+    try:
+        return await _run(func, *args)
+    finally:
+        for user_id in user_ids:
+            _pending_writes[user_id] -= 1
+            if not _pending_writes[user_id]:
+                del _pending_writes[user_id]
+
+
+async def save_message(user_id: int, username: str, sender: str, message: str):
+    """
+    Saves a chat message to the database.
+
+    Args:
+        user_id (int): Unique identifier of the user.
+        username (str): Telegram username of the user.
+        sender (str): Either 'user' or 'bot', indicating who sent the message.
+        message (str): The text content of the message.
+    """
+    await _run_write({user_id}, chat_database.save_messages, [(user_id, username, sender, message)])
+
+
+async def save_messages(records: list[tuple[int, str, str, str]]):
+    """
+    Saves several chat messages in the same commit.
+
+    Args:
+        records (list[tuple[int, str, str, str]]): Messages as (user_id, username, sender, message) tuples.
+    """
+    await _run_write({record[0] for record in records}, chat_database.save_messages, records)
+
+
+async def load_messages(user_id: int, username: str) -> list:
+    """
+    Retrieves all chat messages for a specific user.
+
+    Args:
+        user_id (int): Unique identifier of the user.
+        username (str): Telegram username of the user.
+
+    Returns:
+        list: A list of tuples containing message records (username, sender, message, timestamp).
+    """
+    return await _run(chat_database.load_messages, user_id, username)
+
+
+async def load_recent_messages(user_id: int, username: str, limit: int) -> list:
+    """
+    Retrieves the most recent chat messages for a specific user.
+
+    Args:
+        user_id (int): Unique identifier of the user.
+        username (str): Telegram username of the user.
+        limit (int): Maximum number of messages to return.
+
+    Returns:
+        list: A list of tuples containing message records (username, sender, message, timestamp),
+              oldest first.
+    """
+    if not _pending_writes.get(user_id):
+        messages = chat_database.history_cache.get(user_id, limit, record_miss=False)
+        if messages is not None:
+            return messages
+    return await _run(chat_database.load_recent_messages, user_id, username, limit)
+
+
+async def delete_messages(user_id: int, username: str):
+    """
+    Deletes all chat messages associated with a specific user.
+
+    Args:
+        user_id (int): Unique identifier of the user.
+        username (str): Telegram username of the user.
+    """
+    await _run_write({user_id}, chat_database.delete_messages, user_id, username)
+
+
+async def close():
+    """
+    Waits for queued jobs to finish, flushes buffered writes, stops the worker
+    and closes the connections.
+    """
+    global _worker
+    with _worker_lock:
+        worker, _worker = _worker, None
+
+    if worker is not None and worker.is_alive():
+        await asyncio.to_thread(worker.jobs.put, None)
+        await asyncio.to_thread(worker.join)
+        logger.info("Chat database worker has been stopped.")
+    chat_database.close_connections()
@@ -1,7 +1,9 @@
-import sqlite3
 import os
 import logging
+from datetime import datetime, timezone
 from tools import setup_logger
+from .connection_pool import ConnectionPool
+from .history_cache import HistoryCache
 
 # Initialize logger configuration
 setup_logger()
@@ -23,11 +25,62 @@ if not os.path.isdir(_CHAT_HISTORY_PATH):
 # Define user database file path
 _USER_DATABASE_PATH = os.path.join(_BASE_PATH, "users.db")
 
+# Define consolidated chat history file path
+_CONSOLIDATED_DB_PATH = os.path.join(_BASE_PATH, "chat_history.db")
+
+# Chat history layout: 'per_user' keeps one file per user,
+# 'consolidated' keeps every user's messages in a single file
+STORAGE_PER_USER = "per_user"
+STORAGE_CONSOLIDATED = "consolidated"
+STORAGE_MODE = os.getenv("CHAT_STORAGE_MODE", STORAGE_PER_USER).strip().lower()
+
+if STORAGE_MODE not in (STORAGE_PER_USER, STORAGE_CONSOLIDATED):
+    logger.warning(f"Unknown chat storage mode '{STORAGE_MODE}'. Falling back to '{STORAGE_PER_USER}'.")
+    STORAGE_MODE = STORAGE_PER_USER
+
+# Maximum number of SQLite files kept open at the same time
+_MAX_OPEN_CONNECTIONS = int(os.getenv("CHAT_DB_MAX_CONNECTIONS", "64"))
+
+_USERS_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY,
+        username TEXT
+    );
+'''
+
+_MESSAGES_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        username TEXT,
+        sender TEXT,
+        message TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS idx_messages_user_id ON messages (user_id, id);
+'''
+
+# Long-lived connections shared by every database call
+_pool = ConnectionPool(max_connections=_MAX_OPEN_CONNECTIONS)
+
+# Users already stored in the user database during this process
+_known_users: set[int] = set()
+
+# Recent conversation turns kept in memory, keyed by user ID
+history_cache = HistoryCache(
+    max_users=int(os.getenv("CHAT_CACHE_MAX_USERS", "1000")),
+    max_bytes=int(os.getenv("CHAT_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+    max_messages=int(os.getenv("CHAT_CACHE_MAX_MESSAGES", "50")),
+    ttl=float(os.getenv("CHAT_CACHE_TTL", "600"))
+)
+
 
 def _get_chat_db_path(user_id: int, username: str) -> str:
     """
     Generates the database file path for a user's chat history.
 
+    In consolidated storage mode every user shares the same file.
+
     Args:
         user_id (int): Unique identifier of the user.
         username (str): Telegram username of the user.
@@ -35,6 +88,9 @@ def _get_chat_db_path(user_id: int, username: str) -> str:
     Returns:
         str: The file path of the user's chat database.
     """
+    if STORAGE_MODE == STORAGE_CONSOLIDATED:
+        return _CONSOLIDATED_DB_PATH
+
     sanitized_username = "".join(c if c.isalnum() or c in ("_", "-") else "" for c in username)
     return os.path.join(_CHAT_HISTORY_PATH, f"{sanitized_username}_{user_id}.db")
 
@@ -45,60 +101,57 @@ def init_user_db():
 
     This function creates a 'users' table if it does not already exist.
     """
-    conn = sqlite3.connect(_USER_DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            user_id INTEGER PRIMARY KEY,
-            username TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    with _pool.connection(_USER_DATABASE_PATH, _USERS_SCHEMA):
+        pass
 
 
-def _add_user(user_id: int, username: str):
+def _add_users(users: dict[int, str]):
     """
-    Adds a user to the user database if they are not already registered.
+    Adds users to the user database if they are not already registered.
+
+    Users registered during this process are remembered, so the user database
+    is only touched on a user's first message.
 
     Args:
-        user_id (int): Unique identifier of the user.
-        username (str): Telegram username of the user.
+        users (dict[int, str]): Telegram usernames keyed by user ID.
     """
-    conn = sqlite3.connect(_USER_DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute('SELECT user_id FROM users WHERE user_id = ?', (user_id,))
-    if not cursor.fetchone():
-        cursor.execute('INSERT INTO users (user_id, username) VALUES (?, ?)', (user_id, username))
-    conn.commit()
-    conn.close()
+    new_users = [(user_id, username) for user_id, username in users.items() if user_id not in _known_users]
+    if not new_users:
+        return
 
+    with _pool.connection(_USER_DATABASE_PATH, _USERS_SCHEMA) as conn:
+        conn.executemany('INSERT OR IGNORE INTO users (user_id, username) VALUES (?, ?)', new_users)
+    _known_users.update(user_id for user_id, _ in new_users)
 
-def _init_chat_db(user_id: int, username: str):
-    """
-    Initializes the SQLite database to store chat messages for a specific user.
 
-    This function creates a 'messages' table if it does not already exist.
+def save_messages(records: list[tuple[int, str, str, str]]):
+    """
+    Saves several chat messages, committing once per database file.
 
     Args:
-        user_id (int): Unique identifier of the user.
-        username (str): Telegram username of the user.
+        records (list[tuple[int, str, str, str]]): Messages as (user_id, username, sender, message) tuples.
     """
-    db_path = _get_chat_db_path(user_id, username)
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            username TEXT,
-            sender TEXT,
-            message TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    users: dict[int, str] = {}
+    rows_by_path: dict[str, list[tuple[int, str, str, str]]] = {}
+    for user_id, username, sender, message in records:
+        users[user_id] = username
+        rows_by_path.setdefault(_get_chat_db_path(user_id, username), []).append((user_id, username, sender, message))
+
+    _add_users(users)
+    for db_path, rows in rows_by_path.items():
+        with _pool.connection(db_path, _MESSAGES_SCHEMA) as conn:
+            conn.executemany('''
+                INSERT INTO messages (user_id, username, sender, message)
+                VALUES (?, ?, ?, ?)
+            ''', rows)
+
+    # Keep cached histories coherent with the rows that were just committed
+    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    records_by_user: dict[int, list[tuple[str, str, str, str]]] = {}
+    for user_id, username, sender, message in records:
+        records_by_user.setdefault(user_id, []).append((username, sender, message, timestamp))
+    for user_id, user_records in records_by_user.items():
+        history_cache.append(user_id, user_records)
 
 
 def save_message(user_id: int, username: str, sender: str, message: str):
@@ -111,17 +164,7 @@ def save_message(user_id: int, username: str, sender: str, message: str):
         sender (str): Either 'user' or 'bot', indicating who sent the message.
         message (str): The text content of the message.
     """
-    _add_user(user_id, username)
-    _init_chat_db(user_id, username)
-    db_path = _get_chat_db_path(user_id, username)
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO messages (user_id, username, sender, message)
-        VALUES (?, ?, ?, ?)
-    ''', (user_id, username, sender, message))
-    conn.commit()
-    conn.close()
+    save_messages([(user_id, username, sender, message)])
 
 
 def load_messages(user_id: int, username: str) -> list:
@@ -138,13 +181,55 @@ def load_messages(user_id: int, username: str) -> list:
     db_path = _get_chat_db_path(user_id, username)
     if not os.path.exists(db_path):
         return []
-    
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('SELECT username, sender, message, timestamp FROM messages WHERE user_id = ?', (user_id,))
-    messages = cursor.fetchall()
-    conn.close()
-    return messages
+
+    with _pool.connection(db_path, _MESSAGES_SCHEMA) as conn:
+        cursor = conn.execute('SELECT username, sender, message, timestamp FROM messages WHERE user_id = ?', (user_id,))
+        return cursor.fetchall()
+
+
+def load_recent_messages(user_id: int, username: str, limit: int) -> list:
+    """
+    Retrieves the most recent chat messages for a specific user.
+
+    Messages are served from the in-memory history cache when possible.
+    Otherwise only the tail of the history is read through the (user_id, id)
+    index, so the cost does not grow with the size of the history.
+
+    Args:
+        user_id (int): Unique identifier of the user.
+        username (str): Telegram username of the user.
+        limit (int): Maximum number of messages to return.
+
+    Returns:
+        list: A list of tuples containing message records (username, sender, message, timestamp),
+              oldest first.
+    """
+    if limit <= 0:
+        return []
+
+    messages = history_cache.get(user_id, limit)
+    if messages is not None:
+        return messages
+
+    db_path = _get_chat_db_path(user_id, username)
+    if not os.path.exists(db_path):
+        history_cache.put(user_id, [], complete=True)
+        return []
+
+    # Read enough rows to answer later requests from the cache as well
+    read_limit = max(limit, history_cache.max_messages)
+    with _pool.connection(db_path, _MESSAGES_SCHEMA) as conn:
+        cursor = conn.execute('''
+            SELECT username, sender, message, timestamp FROM messages
+            WHERE user_id = ?
+            ORDER BY id DESC
+            LIMIT ?
+        ''', (user_id, read_limit))
+        messages = cursor.fetchall()
+    messages.reverse()
+
+    history_cache.put(user_id, messages, complete=len(messages) < read_limit)
+    return messages[-limit:]
 
 
 def delete_messages(user_id: int, username: str):
@@ -157,8 +242,23 @@ def delete_messages(user_id: int, username: str):
     """
     db_path = _get_chat_db_path(user_id, username)
     if os.path.exists(db_path):
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM messages WHERE user_id = ?', (user_id,))
-        conn.commit()
-        conn.close()
\ No newline at end of file
+        with _pool.connection(db_path, _MESSAGES_SCHEMA) as conn:
+            conn.execute('DELETE FROM messages WHERE user_id = ?', (user_id,))
+    history_cache.put(user_id, [], complete=True)
+
+
+def cache_stats() -> dict[str, int]:
+    """
+    Returns the hit/miss counters and size of the chat history cache.
+
+    Returns:
+        dict[str, int]: Monitoring counters of the history cache.
+    """
+    return history_cache.stats()
+
+
+def close_connections():
+    """
+    Closes every pooled database connection.
+    """
+    _pool.close_all()
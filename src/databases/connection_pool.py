@@ -0,0 +1,112 @@
+import sqlite3
+import threading
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from tools import setup_logger
+
+# Initialize logger configuration
+setup_logger()
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """
+    Keeps long-lived SQLite connections keyed by database file.
+
+    Connections are opened in WAL mode and reused across calls. The number of
+    open handles is capped; when the cap is reached the least recently used
+    connection is closed. Each file's schema is applied only once per process.
+    """
+
+    def __init__(self, max_connections: int = 64):
+        """
+        Args:
+            max_connections (int): Maximum number of connections kept open at once.
+        """
+        self.max_connections = max(1, max_connections)
+        self._connections: OrderedDict[str, sqlite3.Connection] = OrderedDict()
+        self._initialized: set[str] = set()
+        self._lock = threading.RLock()
+
+    def _open(self, db_path: str) -> sqlite3.Connection:
+        """
+        Opens a new connection configured for concurrent readers and fast writes.
+
+        Args:
+            db_path (str): Path of the SQLite database file.
+
+        Returns:
+            sqlite3.Connection: The opened connection.
+        """
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _get(self, db_path: str, schema: str = None) -> sqlite3.Connection:
+        """
+        Returns the cached connection for a file, opening it if necessary.
+        Must be called with the pool lock held.
+        """
+        conn = self._connections.get(db_path)
+        if conn is not None:
+            self._connections.move_to_end(db_path)
+        else:
+            conn = self._open(db_path)
+            self._connections[db_path] = conn
+            while len(self._connections) > self.max_connections:
+                evicted_path, evicted = self._connections.popitem(last=False)
+                evicted.close()
+                logger.debug("Closed idle database connection: %s", evicted_path)
+
+        if schema and db_path not in self._initialized:
+            conn.executescript(schema)
+            self._initialized.add(db_path)
+        return conn
+
+    @contextmanager
+    def connection(self, db_path: str, schema: str = None):
+        """
+        Yields a pooled connection inside a transaction.
+
+        The transaction is committed when the block exits normally and rolled
+        back if it raises. Access is serialized, so a connection is never used
+        by two threads at the same time.
+
+        Args:
+            db_path (str): Path of the SQLite database file.
+            schema (str, optional): SQL script applied the first time the file is used.
+
+        Yields:
+            sqlite3.Connection: The pooled connection.
+        """
+        with self._lock:
+            conn = self._get(db_path, schema)
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def close(self, db_path: str):
+        """
+        Closes the pooled connection of a single database file, if open.
+
+        Args:
+            db_path (str): Path of the SQLite database file.
+        """
+        with self._lock:
+            conn = self._connections.pop(db_path, None)
+            if conn is not None:
+                conn.close()
+
+    def close_all(self):
+        """
+        Closes every pooled connection.
+        """
+        with self._lock:
+            while self._connections:
+                _, conn = self._connections.popitem(last=False)
+                conn.close()
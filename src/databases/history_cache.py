@@ -0,0 +1,187 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Approximate per-message bookkeeping overhead in bytes
+_MESSAGE_OVERHEAD = 64
+
+
+class _Entry:
+    """
+    Cached tail of one user's chat history.
+    """
+    __slots__ = ("messages", "complete", "size", "expires_at")
+
+    def __init__(self, messages: list, complete: bool, expires_at: float):
+        self.messages = messages
+        self.complete = complete
+        self.size = sum(_message_size(record) for record in messages)
+        self.expires_at = expires_at
+
+
+def _message_size(record: tuple) -> int:
+    """
+    Estimates the memory held by a message record.
+    """
+    return sum(len(field) for field in record if isinstance(field, str)) + _MESSAGE_OVERHEAD
+
+
+class HistoryCache:
+    """
+    LRU cache of the most recent messages of each user, with a time-to-live.
+
+    Each entry keeps at most `max_messages` records per user, and the cache is
+    bounded both by the number of users and by the approximate memory used by
+    the cached messages. An entry is marked complete when it holds the user's
+    whole history, which lets requests for more messages than are cached
+    still be answered from memory.
+    """
+
+    def __init__(self, max_users: int = 1000, max_bytes: int = 16 * 1024 * 1024,
+                 max_messages: int = 50, ttl: float = 600):
+        """
+        Args:
+            max_users (int): Maximum number of users kept in the cache.
+            max_bytes (int): Approximate memory limit of all cached messages.
+            max_messages (int): Maximum number of messages kept per user.
+            ttl (float): Seconds after which an entry is reloaded from the database.
+        """
+        self.max_users = max(1, max_users)
+        self.max_bytes = max_bytes
+        self.max_messages = max(1, max_messages)
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, limit: int, record_miss: bool = True) -> list:
+        """
+        Returns the most recent cached messages of a user.
+
+        Args:
+            user_id (int): Unique identifier of the user.
+            limit (int): Maximum number of messages to return.
+            record_miss (bool): Count a miss in the statistics. Disabled for lookups
+                                that fall back to another cached lookup.
+
+        Returns:
+            list: Message records oldest first, or None if the cache cannot answer the request.
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._remove(user_id)
+                entry = None
+
+            if entry is None or (len(entry.messages) < limit and not entry.complete):
+                if record_miss:
+                    self.misses += 1
+                return None
+
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry.messages[-limit:] if limit > 0 else []
+
+    def put(self, user_id: int, messages: list, complete: bool):
+        """
+        Stores the most recent messages of a user read from the database.
+
+        Args:
+            user_id (int): Unique identifier of the user.
+            messages (list): Message records oldest first.
+            complete (bool): Whether `messages` is the user's whole history.
+        """
+        if len(messages) > self.max_messages:
+            messages, complete = messages[-self.max_messages:], False
+
+        with self._lock:
+            self._remove(user_id)
+            entry = _Entry(list(messages), complete, time.monotonic() + self.ttl)
+            self._entries[user_id] = entry
+            self._size += entry.size
+            self._evict()
+
+    def append(self, user_id: int, records: list):
+        """
+        Appends newly saved messages to a user's entry, if the user is cached.
+
+        Args:
+            user_id (int): Unique identifier of the user.
+            records (list): Message records oldest first.
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return
+
+            entry.messages.extend(records)
+            entry.size += sum(_message_size(record) for record in records)
+            self._size += sum(_message_size(record) for record in records)
+
+            overflow = len(entry.messages) - self.max_messages
+            if overflow > 0:
+                dropped = sum(_message_size(record) for record in entry.messages[:overflow])
+                del entry.messages[:overflow]
+                entry.size -= dropped
+                self._size -= dropped
+                entry.complete = False
+
+            self._entries.move_to_end(user_id)
+            self._evict()
+
+    def invalidate(self, user_id: int):
+        """
+        Removes a user's entry from the cache.
+
+        Args:
+            user_id (int): Unique identifier of the user.
+        """
+        with self._lock:
+            self._remove(user_id)
+
+    def clear(self):
+        """
+        Removes every entry from the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns hit/miss counters and the current size of the cache.
+
+        Returns:
+            dict[str, int]: Monitoring counters.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "users": len(self._entries),
+                "bytes": self._size,
+            }
+
+    def _remove(self, user_id: int):
+        """
+        Removes an entry. Must be called with the lock held.
+        """
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self._size -= entry.size
+
+    def _evict(self):
+        """
+        Evicts least recently used entries until the cache fits its limits.
+        Must be called with the lock held.
+        """
+        while self._entries and (len(self._entries) > self.max_users or self._size > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            self._size -= entry.size
+            self.evictions += 1
@@ -0,0 +1,103 @@
+"""
+One-shot migration from per-user chat history files to the consolidated store.
+
+Usage:
+    $ python3 src/databases/migrate_chat_history.py [--remove-source]
+
+Run it from the same working directory as the bot, then start the bot with
+`CHAT_STORAGE_MODE=consolidated`. Files that have already been imported are
+recorded in the consolidated database and skipped on later runs.
+"""
+import argparse
+import glob
+import logging
+import os
+import sys
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import setup_logger
+from databases import chat_database
+
+# Initialize logger configuration
+setup_logger()
+logger = logging.getLogger(__name__)
+
+_MIGRATIONS_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS migrated_files (
+        file_name TEXT PRIMARY KEY,
+        message_count INTEGER,
+        migrated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+'''
+
+
+def migrate(remove_source: bool = False) -> tuple[int, int]:
+    """
+    Bulk-imports every per-user chat history file into the consolidated database.
+
+    Each file is copied in a single `INSERT ... SELECT` transaction, preserving
+    the original message order and timestamps.
+
+    Args:
+        remove_source (bool): Delete each per-user file once it has been imported.
+
+    Returns:
+        tuple[int, int]: Number of imported files and number of imported messages.
+    """
+    source_files = sorted(glob.glob(os.path.join(chat_database._CHAT_HISTORY_PATH, "*.db")))
+    schema = chat_database._MESSAGES_SCHEMA + _MIGRATIONS_SCHEMA
+    imported_files, imported_messages = 0, 0
+
+    with chat_database._pool.connection(chat_database._CONSOLIDATED_DB_PATH, schema) as conn:
+        for source_file in source_files:
+            file_name = os.path.basename(source_file)
+            if conn.execute('SELECT 1 FROM migrated_files WHERE file_name = ?', (file_name,)).fetchone():
+                logger.info(f"Skipping already migrated file: {file_name}")
+                continue
+
+            conn.execute('ATTACH DATABASE ? AS source', (source_file,))
+            try:
+                cursor = conn.execute('''
+                    INSERT INTO messages (user_id, username, sender, message, timestamp)
+                    SELECT user_id, username, sender, message, timestamp FROM source.messages
+                    ORDER BY id
+                ''')
+                message_count = cursor.rowcount
+                conn.execute(
+                    'INSERT INTO migrated_files (file_name, message_count) VALUES (?, ?)',
+                    (file_name, message_count)
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.execute('DETACH DATABASE source')
+
+            imported_files += 1
+            imported_messages += message_count
+            logger.info(f"Migrated {message_count} messages from {file_name}")
+
+            if remove_source:
+                chat_database._pool.close(source_file)
+                for path in (source_file, f"{source_file}-wal", f"{source_file}-shm"):
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    return imported_files, imported_messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--remove-source", action="store_true", help="Delete per-user files after importing them")
+    args = parser.parse_args()
+
+    imported_files, imported_messages = migrate(remove_source=args.remove_source)
+    logger.info(f"Migration finished: {imported_messages} messages from {imported_files} files.")
+    chat_database.close_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import time
+from tools import setup_logger
+from .connection_pool import ConnectionPool
+
+# Initialize logger configuration
+setup_logger()
+logger = logging.getLogger(__name__)
+
+# Define search cache file path
+_SEARCH_CACHE_PATH = os.path.join(os.getcwd(), "user_database", "search_cache.db")
+
+_SEARCH_CACHE_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS search_results (
+        query_key TEXT PRIMARY KEY,
+        response TEXT,
+        size INTEGER,
+        created_at REAL,
+        accessed_at REAL
+    );
+    CREATE INDEX IF NOT EXISTS idx_search_results_accessed_at ON search_results (accessed_at);
+
+    CREATE TABLE IF NOT EXISTS page_contents (
+        url TEXT PRIMARY KEY,
+        content TEXT,
+        etag TEXT,
+        last_modified TEXT,
+        size INTEGER,
+        fetched_at REAL,
+        accessed_at REAL
+    );
+    CREATE INDEX IF NOT EXISTS idx_page_contents_accessed_at ON page_contents (accessed_at);
+'''
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a search query so that trivially different spellings share a cache entry.
+
+    Args:
+        query (str): The search query.
+
+    Returns:
+        str: Lower-cased query with collapsed whitespace.
+    """
+    return " ".join(query.lower().split())
+
+
+class SearchCache:
+    """
+    Persistent cache of web search responses and extracted page text.
+
+    Search responses are keyed by normalized query and expire after
+    `search_ttl` seconds. Page text is keyed by URL; once older than
+    `page_ttl` it is reported as stale together with its ETag and
+    Last-Modified validators, so the caller can revalidate it with a
+    conditional request instead of downloading it again. When the cache
+    grows beyond `max_bytes`, the least recently used entries are evicted.
+    """
+
+    def __init__(self, db_path: str = _SEARCH_CACHE_PATH, search_ttl: float = 86400,
+                 page_ttl: float = 86400, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            db_path (str): Path of the SQLite cache file.
+            search_ttl (float): Seconds a search response stays valid.
+            page_ttl (float): Seconds a page is used without revalidation.
+            max_bytes (int): Approximate size limit of the cached data.
+        """
+        self.db_path = db_path
+        self.search_ttl = search_ttl
+        self.page_ttl = page_ttl
+        self.max_bytes = max_bytes
+        self._pool = ConnectionPool(max_connections=1)
+
+    def get_search(self, query: str) -> dict:
+        """
+        Returns the cached search response of a query.
+
+        Args:
+            query (str): The search query.
+
+        Returns:
+            dict: The cached search response, or None if it is missing or expired.
+        """
+        key = normalize_query(query)
+        now = time.time()
+        with self._pool.connection(self.db_path, _SEARCH_CACHE_SCHEMA) as conn:
+            row = conn.execute(
+                'SELECT response FROM search_results WHERE query_key = ? AND created_at > ?',
+                (key, now - self.search_ttl)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE search_results SET accessed_at = ? WHERE query_key = ?', (now, key))
+        return json.loads(row[0])
+
+    def put_search(self, query: str, response: dict):
+        """
+        Stores the search response of a query.
+
+        Args:
+            query (str): The search query.
+            response (dict): Search response to cache.
+        """
+        data = json.dumps(response, ensure_ascii=False)
+        now = time.time()
+        with self._pool.connection(self.db_path, _SEARCH_CACHE_SCHEMA) as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO search_results (query_key, response, size, created_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (normalize_query(query), data, len(data), now, now)
+            )
+            self._evict(conn)
+
+    def get_page(self, url: str) -> dict:
+        """
+        Returns the cached text of a page.
+
+        Args:
+            url (str): The URL of the web page.
+
+        Returns:
+            dict: 'content', 'etag', 'last_modified' and 'fresh' (False once the
+                  page should be revalidated), or None if the page is not cached.
+        """
+        now = time.time()
+        with self._pool.connection(self.db_path, _SEARCH_CACHE_SCHEMA) as conn:
+            row = conn.execute(
+                'SELECT content, etag, last_modified, fetched_at FROM page_contents WHERE url = ?',
+                (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE page_contents SET accessed_at = ? WHERE url = ?', (now, url))
+
+        content, etag, last_modified, fetched_at = row
+        return {
+            "content": content,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fresh": fetched_at > now - self.page_ttl
+        }
+
+    def put_page(self, url: str, content: str, etag: str = None, last_modified: str = None):
+        """
+        Stores the extracted text of a page.
+
+        Args:
+            url (str): The URL of the web page.
+            content (str): Extracted page text.
+            etag (str, optional): ETag header of the response.
+            last_modified (str, optional): Last-Modified header of the response.
+        """
+        now = time.time()
+        with self._pool.connection(self.db_path, _SEARCH_CACHE_SCHEMA) as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO page_contents '
+                '(url, content, etag, last_modified, size, fetched_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, content, etag, last_modified, len(content), now, now)
+            )
+            self._evict(conn)
+
+    def touch_page(self, url: str):
+        """
+        Marks a cached page as fresh again after a successful revalidation.
+
+        Args:
+            url (str): The URL of the web page.
+        """
+        now = time.time()
+        with self._pool.connection(self.db_path, _SEARCH_CACHE_SCHEMA) as conn:
+            conn.execute('UPDATE page_contents SET fetched_at = ?, accessed_at = ? WHERE url = ?', (now, now, url))
+
+    def close(self):
+        """
+        Closes the cache database connection.
+        """
+        self._pool.close_all()
+
+    def _evict(self, conn):
+        """
+        Deletes least recently used entries until the cache fits `max_bytes`.
+        """
+        total = conn.execute(
+            'SELECT (SELECT COALESCE(SUM(size), 0) FROM search_results) + '
+            '(SELECT COALESCE(SUM(size), 0) FROM page_contents)'
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = conn.execute('''
+            SELECT 'search_results', query_key, size, accessed_at FROM search_results
+            UNION ALL
+            SELECT 'page_contents', url, size, accessed_at FROM page_contents
+            ORDER BY accessed_at
+        ''')
+        evicted = {"search_results": [], "page_contents": []}
+        for table, key, size, _ in rows:
+            if total <= self.max_bytes:
+                break
+            evicted[table].append((key,))
+            total -= size
+
+        conn.executemany('DELETE FROM search_results WHERE query_key = ?', evicted["search_results"])
+        conn.executemany('DELETE FROM page_contents WHERE url = ?', evicted["page_contents"])
+        logger.info(
+            "Evicted %d search results and %d pages from the search cache.",
+            len(evicted["search_results"]), len(evicted["page_contents"])
+        )
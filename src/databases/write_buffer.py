@@ -0,0 +1,83 @@
+import concurrent.futures
+import logging
+import time
+from tools import setup_logger
+from . import chat_database
+
+# Initialize logger configuration
+setup_logger()
+logger = logging.getLogger(__name__)
+
+
+class WriteBuffer:
+    """
+    Write-behind buffer that groups chat messages into a single commit.
+
+    Messages from many conversations are collected until either `max_rows`
+    messages are pending or the oldest one has waited `flush_interval`
+    seconds, then they are written in one transaction per database file.
+    Callers are notified through their futures only after the commit.
+    """
+
+    def __init__(self, flush_interval: float = 0.005, max_rows: int = 500):
+        """
+        Args:
+            flush_interval (float): Maximum time in seconds a message waits before being committed.
+            max_rows (int): Number of pending messages that triggers an immediate flush.
+        """
+        self.flush_interval = flush_interval
+        self.max_rows = max(1, max_rows)
+        self._records: list[tuple[int, str, str, str]] = []
+        self._futures: list[concurrent.futures.Future] = []
+        self._first_added_at: float = None
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def add(self, records: list[tuple[int, str, str, str]], future: concurrent.futures.Future):
+        """
+        Adds messages to the buffer.
+
+        Args:
+            records (list[tuple[int, str, str, str]]): Messages as (user_id, username, sender, message) tuples.
+            future (concurrent.futures.Future): Resolved once the messages have been committed.
+        """
+        if not self._records:
+            self._first_added_at = time.monotonic()
+        self._records.extend(records)
+        self._futures.append(future)
+
+    def is_full(self) -> bool:
+        """
+        Returns whether the buffer reached its row limit.
+        """
+        return len(self._records) >= self.max_rows
+
+    def time_until_due(self) -> float:
+        """
+        Returns the number of seconds left before the buffer must be flushed,
+        or None when the buffer is empty.
+        """
+        if not self._records:
+            return None
+        return max(0.0, self._first_added_at + self.flush_interval - time.monotonic())
+
+    def flush(self):
+        """
+        Commits all buffered messages and resolves the waiting futures.
+        """
+        if not self._records:
+            return
+
+        records, futures = self._records, self._futures
+        self._records, self._futures, self._first_added_at = [], [], None
+        try:
+            chat_database.save_messages(records)
+        except Exception as e:
+            logger.error("Failed to commit %d buffered messages: %s", len(records), e)
+            for future in futures:
+                future.set_exception(e)
+        else:
+            logger.debug("Committed %d buffered messages.", len(records))
+            for future in futures:
+                future.set_result(None)
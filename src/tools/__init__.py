@@ -3,7 +3,19 @@ from sys import path
 
 path.insert(0, dirname(__file__))
 
-from .text2markdown import text2markdown
-from .send_message import send_message
 from .logger import setup_logger
-from .load_prompt import load_prompt
\ No newline at end of file
+from .text2markdown import text2markdown
+from .message_tracker import track_message, pop_tracked_messages, track_incoming_message
+from .send_message import send_message, split_message
+from .load_prompt import load_prompt
+from .context_builder import build_context, estimate_tokens
+from .stream_message import StreamingMessage, render_partial_markdown
+from .html_extractor import extract_text, extract_paragraphs, read_body
+from .parse_pool import ParsePool
+from .passage_ranker import pack_passages
+from .ttl_cache import TTLCache
+from .request_scheduler import RequestScheduler, SchedulerBusyError
+from .rate_limiter import RateLimiter, TokenBucket, CircuitBreaker, CircuitOpenError
+from .response_cache import ResponseCache, context_key as response_context_key
+from .send_queue import send_queue, SendQueue, PRIORITY_REPLY, PRIORITY_EDIT, PRIORITY_BULK
+from .metrics import track, instrument_handler, watch_cache, MetricsServer, registry as metrics_registry
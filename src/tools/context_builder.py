@@ -0,0 +1,95 @@
+"""
+Builds GPT chat context that fits into a token budget.
+
+Token counts are estimated locally without a tokenizer: Latin text averages
+about four characters per token, while Hangul, CJK and other multi-byte
+characters average about one token each.
+"""
+
+# Tokens added by the chat format around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Marker appended to turns that were shortened to fit the budget
+TRUNCATION_MARKER = " …(truncated)"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the number of tokens of a text.
+
+    Args:
+        text (str): Text to measure.
+
+    Returns:
+        int: Estimated token count.
+    """
+    if not text:
+        return 0
+    # Multi-byte characters are counted from the UTF-8 length, which is computed in C
+    multibyte_chars = (len(text.encode("utf-8")) - len(text)) // 2
+    single_byte_chars = max(0, len(text) - multibyte_chars)
+    return (single_byte_chars + 3) // 4 + multibyte_chars
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Shortens a text so that its estimated token count fits `max_tokens`.
+
+    The beginning of the text is kept, since it usually carries the question.
+
+    Args:
+        text (str): Text to shorten.
+        max_tokens (int): Maximum estimated token count.
+
+    Returns:
+        str: The original text if it fits, otherwise a shortened copy ending with a marker.
+    """
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+
+    budget = max(0, max_tokens - estimate_tokens(TRUNCATION_MARKER))
+    cut = int(len(text) * budget / tokens)
+    while cut > 0 and estimate_tokens(text[:cut]) > budget:
+        cut = int(cut * 0.9)
+    return text[:cut].rstrip() + TRUNCATION_MARKER
+
+
+def build_context(system_prompt: str, history: list[dict[str, str]], user_prompt: str,
+                  token_budget: int, max_turn_tokens: int) -> tuple[list[dict[str, str]], int]:
+    """
+    Packs the most recent conversation turns into a token budget.
+
+    The system prompt and the new user prompt are always included. History
+    messages are added from newest to oldest, each shortened to at most
+    `max_turn_tokens`, until the next message no longer fits.
+
+    Args:
+        system_prompt (str): Instruction for the GPT model.
+        history (list[dict[str, str]]): Previous messages oldest first, as {"role", "content"} dicts.
+        user_prompt (str): User's new input message.
+        token_budget (int): Maximum estimated token count of the whole prompt.
+        max_turn_tokens (int): Maximum estimated token count of a single history message.
+
+    Returns:
+        tuple[list[dict[str, str]], int]: Messages for the chat completion API and their estimated token count.
+    """
+    used = (
+        estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
+        + 2 * MESSAGE_OVERHEAD_TOKENS
+    )
+
+    selected = []
+    for turn in reversed(history):
+        content = truncate_to_tokens(turn["content"], max_turn_tokens)
+        cost = estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+        if used + cost > token_budget:
+            break
+        selected.append({"role": turn["role"], "content": content})
+        used += cost
+    selected.reverse()
+
+    messages = [{"role": "system", "content": system_prompt}]
+    messages.extend(selected)
+    messages.append({"role": "user", "content": user_prompt})
+    return messages, used
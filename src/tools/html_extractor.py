@@ -0,0 +1,183 @@
+"""
+Incremental extraction of paragraph text from HTML.
+
+Unlike building a full BeautifulSoup tree, the parser only keeps the text of
+`<p>` elements and stops as soon as enough characters have been collected,
+so the rest of the page does not need to be downloaded or parsed.
+"""
+import codecs
+from html.parser import HTMLParser
+
+import aiohttp
+
+# Elements whose text is never shown to a reader
+_IGNORED_TAGS = {"script", "style", "noscript", "template"}
+
+
+class ParagraphExtractor(HTMLParser):
+    """
+    HTML parser that collects the text of paragraphs until a character limit is reached.
+    """
+
+    def __init__(self, limit: int):
+        """
+        Args:
+            limit (int): Number of characters after which parsing can stop.
+        """
+        super().__init__(convert_charrefs=True)
+        self.limit = limit
+        self.paragraphs: list[str] = []
+        self.length = 0
+        self.done = False
+
+        self._paragraph_depth = 0
+        self._ignored_depth = 0
+        self._current: list[str] = []
+
+    @property
+    def text(self) -> str:
+        """
+        Returns the collected paragraphs, joined by newlines and cut to the limit.
+        """
+        return "\n".join(self.paragraphs)[:self.limit]
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _IGNORED_TAGS:
+            self._ignored_depth += 1
+        elif tag == "p":
+            # An opening <p> implicitly closes a paragraph that is still open
+            if self._paragraph_depth:
+                self._end_paragraph()
+            self._paragraph_depth = 1
+
+    def handle_endtag(self, tag):
+        if tag in _IGNORED_TAGS:
+            self._ignored_depth = max(0, self._ignored_depth - 1)
+        elif tag == "p" and self._paragraph_depth:
+            self._end_paragraph()
+
+    def handle_data(self, data):
+        if self._paragraph_depth and not self._ignored_depth and not self.done:
+            self._current.append(data)
+
+    def close(self):
+        super().close()
+        if self._paragraph_depth:
+            self._end_paragraph()
+
+    def _end_paragraph(self):
+        """
+        Stores the paragraph that is being collected.
+        """
+        self._paragraph_depth = 0
+        text = "".join(self._current)
+        self._current = []
+        if self.done:
+            return
+
+        self.paragraphs.append(text)
+        self.length += len(text) + 1
+        if self.length >= self.limit:
+            self.done = True
+
+
+def extract_text(html: str, limit: int) -> str:
+    """
+    Extracts paragraph text from a complete HTML document.
+
+    Args:
+        html (str): The HTML document.
+        limit (int): Maximum number of characters to return.
+
+    Returns:
+        str: Text of the document's paragraphs, joined by newlines.
+    """
+    parser = ParagraphExtractor(limit)
+    # Feed in slices so that parsing stops soon after the limit is reached
+    for start in range(0, len(html), 16384):
+        parser.feed(html[start:start + 16384])
+        if parser.done:
+            break
+    else:
+        parser.close()
+    return parser.text
+
+
+def extract_text_from_bytes(data: bytes, encoding: str, limit: int) -> str:
+    """
+    Decodes a downloaded HTML document and extracts its paragraph text.
+
+    This is a top-level function so it can be executed in a worker process.
+
+    Args:
+        data (bytes): The raw HTML document.
+        encoding (str): Character set of the document, or None for UTF-8.
+        limit (int): Maximum number of characters to return.
+
+    Returns:
+        str: Text of the document's paragraphs, joined by newlines.
+    """
+    try:
+        html = data.decode(encoding or "utf-8", errors="replace")
+    except LookupError:
+        html = data.decode("utf-8", errors="replace")
+    return extract_text(html, limit)
+
+
+async def read_body(resp: aiohttp.ClientResponse, max_bytes: int, chunk_size: int = 65536) -> bytes:
+    """
+    Downloads a response body, stopping after `max_bytes` bytes.
+
+    Args:
+        resp (aiohttp.ClientResponse): Response whose body has not been read yet.
+        max_bytes (int): Maximum number of bytes to download.
+        chunk_size (int): Number of bytes read from the socket at a time.
+
+    Returns:
+        bytes: The (possibly truncated) response body.
+    """
+    chunks = []
+    received = 0
+    async for chunk in resp.content.iter_chunked(chunk_size):
+        chunks.append(chunk)
+        received += len(chunk)
+        if received >= max_bytes:
+            break
+    return b"".join(chunks)[:max_bytes]
+
+
+async def extract_paragraphs(resp: aiohttp.ClientResponse, limit: int, max_bytes: int,
+                             chunk_size: int = 16384) -> str:
+    """
+    Extracts paragraph text from an HTTP response while it is being downloaded.
+
+    Reading stops once `limit` characters of paragraph text have been
+    collected or `max_bytes` bytes have been received, whichever comes first.
+
+    Args:
+        resp (aiohttp.ClientResponse): Response whose body has not been read yet.
+        limit (int): Maximum number of characters to return.
+        max_bytes (int): Maximum number of bytes to download.
+        chunk_size (int): Number of bytes read from the socket at a time.
+
+    Returns:
+        str: Text of the page's paragraphs, joined by newlines.
+    """
+    try:
+        decoder = codecs.getincrementaldecoder(resp.charset or "utf-8")(errors="replace")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    parser = ParagraphExtractor(limit)
+    received = 0
+
+    async for chunk in resp.content.iter_chunked(chunk_size):
+        received += len(chunk)
+        parser.feed(decoder.decode(chunk))
+        if parser.done or received >= max_bytes:
+            break
+    else:
+        parser.feed(decoder.decode(b"", final=True))
+
+    if not parser.done:
+        parser.close()
+    return parser.text
@@ -1,6 +1,10 @@
-import logging
+import atexit
 import datetime
+import json
+import logging
+import logging.handlers
 import os
+import queue
 
 # Ensure the 'log' directory exists
 log_dir = os.path.join(os.getcwd(), "log")
@@ -8,38 +12,114 @@ if not os.path.isdir(log_dir):
     os.mkdir(log_dir)
     print("log directory is created.")
 
-# Set the default log file name as 'year-month-day.log'
-log_file = datetime.datetime.now().strftime("%Y-%m-%d")
+# Log file format: 'json' (one JSON object per line) or 'text'
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Structured fields copied from a record's `extra` into JSON log lines
+EXTRA_FIELDS = ("user_id", "chat_id", "handler", "latency_ms")
+
+_listener: logging.handlers.QueueListener = None
 
 
 class HttpxFilter(logging.Filter):
     """Filter to exclude 'httpx' logs from being saved to the log file."""
-    
+
     def filter(self, record):
         return "httpx" not in record.name
 
 
-def setup_logger(log_file: str = f"{log_dir}/{log_file}.log", debug_mode: bool = False):
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as single-line JSON objects.
+
+    Structured fields passed with `extra`, such as the user ID, the handler
+    name and its latency, become keys of the object.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DailyFileHandler(logging.FileHandler):
+    """
+    Writes to 'year-month-day.log' in a directory and switches to a new file
+    when the date changes.
+    """
+
+    def __init__(self, directory: str, encoding: str = "utf-8"):
+        """
+        Args:
+            directory (str): Directory of the log files.
+            encoding (str): Encoding of the log files.
+        """
+        self.directory = directory
+        self._date = datetime.date.today()
+        super().__init__(self._path(self._date), encoding=encoding, delay=True)
+
+    def _path(self, date: datetime.date) -> str:
+        return os.path.join(self.directory, f"{date:%Y-%m-%d}.log")
+
+    def emit(self, record: logging.LogRecord):
+        today = datetime.date.today()
+        if today != self._date:
+            # Roll over: the next write opens the file of the new day
+            self._date = today
+            self.close()
+            self.baseFilename = self._path(today)
+        super().emit(record)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that leaves message formatting to the listener thread.
+
+    The standard QueueHandler formats the message in the logging thread so
+    that records can be pickled; records here never leave the process, so
+    they are queued as they are. Log arguments are therefore formatted later
+    and should not be mutated after the call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logger(log_file: str = None, debug_mode: bool = False):
     """
     Configures the logger to write logs to a file and optionally to the console.
 
-    This function sets up a global logger with INFO level logging. It adds a file handler 
-    to save logs to the specified log file and a console handler to display logs on the terminal.
+    Log calls only put the record on a queue; a background thread formats
+    the records and writes them to the console and to the log file, so disk
+    I/O never blocks the event loop. The log file is written as JSON lines
+    (or as text with LOG_FORMAT=text) and a new file is started every day.
     It prevents multiple handlers from being added if the logger is initialized multiple times.
 
     Args:
-        log_file (str): The name of the log file where logs will be saved. 
-                        Defaults to 'year-month-day.log'.
+        log_file (str, optional): The name of the log file where logs will be saved.
+                        Defaults to 'log/year-month-day.log', rolled over daily.
         debug_mode (bool): Toggle the debug mode.
                         In normal mode, log format is 'timestamp, logger name, log level, and message'.
                         In debug mode, return message shows 'file name'.
                         And log format is 'timestamp, file name, logger name, log level, and message'.
     """
+    global _listener
     logger = logging.getLogger()
 
     # Prevent adding multiple handlers if the logger is initialized multiple times
     if not logger.handlers:
-        logger.setLevel(logging.INFO)
+        logger.setLevel(LOG_LEVEL)
 
         if debug_mode:
             # Debug mode: Include file name in log output
@@ -52,17 +132,32 @@ def setup_logger(log_file: str = f"{log_dir}/{log_file}.log", debug_mode: bool =
                 "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
             )
 
-        # File handler to write logs to the specified file
-        file_handler = logging.FileHandler(log_file)
-        file_handler.setFormatter(formatter)
+        # File handler to write logs to the specified file, or to a file per day
+        file_handler = logging.FileHandler(log_file, encoding="utf-8") if log_file else DailyFileHandler(log_dir)
+        file_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else formatter)
         file_handler.addFilter(HttpxFilter())  # Exclude 'httpx' logs
-        logger.addHandler(file_handler)
 
         # Console handler to output logs to the terminal (optional)
         console_handler = logging.StreamHandler()
         console_handler.setFormatter(formatter)
         console_handler.addFilter(HttpxFilter())  # Exclude 'httpx' logs
-        logger.addHandler(console_handler)
+
+        # The handlers run in the listener's thread
+        log_queue = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logger)
+        logger.addHandler(_DeferredQueueHandler(log_queue))
 
         # Suppress 'httpx' logs completely
-        logging.getLogger("httpx").setLevel(logging.WARNING)
\ No newline at end of file
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+def stop_logger():
+    """
+    Writes out the queued records and stops the logging thread.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
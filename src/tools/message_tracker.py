@@ -0,0 +1,55 @@
+from collections import deque
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+# Message IDs remembered per chat; Telegram only lets bots delete messages of the last 48 hours anyway
+MAX_TRACKED_MESSAGES = 1000
+
+_MESSAGE_IDS_KEY = "message_ids"
+
+
+def track_message(context: ContextTypes.DEFAULT_TYPE, message_id: int):
+    """
+    Remembers a message of the current chat so that `/empty` can delete it later.
+
+    Args:
+        context (ContextTypes.DEFAULT_TYPE): Context of the chat the message belongs to.
+        message_id (int): Identifier of the message.
+    """
+    if context.chat_data is None:
+        return
+    message_ids = context.chat_data.get(_MESSAGE_IDS_KEY)
+    if message_ids is None:
+        message_ids = context.chat_data[_MESSAGE_IDS_KEY] = deque(maxlen=MAX_TRACKED_MESSAGES)
+    message_ids.append(message_id)
+
+
+def pop_tracked_messages(context: ContextTypes.DEFAULT_TYPE) -> list[int]:
+    """
+    Returns the remembered messages of the current chat and forgets them.
+
+    Args:
+        context (ContextTypes.DEFAULT_TYPE): Context of the chat.
+
+    Returns:
+        list[int]: Distinct message IDs, oldest first.
+    """
+    if context.chat_data is None:
+        return []
+    message_ids = context.chat_data.pop(_MESSAGE_IDS_KEY, None) or []
+    return list(dict.fromkeys(message_ids))
+
+
+async def track_incoming_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Remembers every message a user sends to the bot.
+
+    Registered in a handler group that runs before the command handlers.
+
+    Args:
+        update (Update): Incoming update.
+        context (ContextTypes.DEFAULT_TYPE): Context of the update.
+    """
+    if update.message is not None:
+        track_message(context, update.message.message_id)
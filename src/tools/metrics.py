@@ -0,0 +1,497 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Handlers and outbound calls record their latency in histograms, their
+outcome in counters and the number of calls in progress in gauges.
+Recording a value costs a lock acquisition and a few additions, and label
+children are looked up once and reused, so instrumentation stays cheap on
+the hot path. `MetricsServer` serves all metrics on `/metrics` for a local
+Prometheus scraper.
+
+Histograms are exported with their buckets, sum and count, plus p50, p95
+and p99 estimates interpolated from the buckets as `<name>_quantile`
+gauges, so the percentiles can also be read without a Prometheus server.
+
+Caches keep their own hit and miss counters; `watch_cache` registers a
+cache whose counters are copied into the registry when metrics are scraped.
+"""
+import bisect
+import functools
+import logging
+import math
+import threading
+import time
+from typing import Callable
+
+from aiohttp import web
+
+from tools.logger import setup_logger
+
+# Initialize the logger configuration
+setup_logger()
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from fast cache hits to slow completions
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Quantiles estimated from histogram buckets
+QUANTILES = (0.5, 0.95, 0.99)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = None) -> str:
+    pairs = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """
+    Base of a metric family with optional labels.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        """
+        Args:
+            name (str): Metric name.
+            documentation (str): Help text of the metric.
+            labelnames (tuple): Names of the labels, in order.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """
+        Returns the child metric of a combination of label values.
+
+        Hot paths should keep the returned child instead of looking it up on every call.
+
+        Args:
+            *values: Label values, in the order of `labelnames`.
+        """
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def collect(self) -> list[str]:
+        """
+        Returns the metric family as lines of the text exposition format.
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._collect_child(values, child))
+        return lines
+
+    def _collect_child(self, values: tuple, child) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class _Value:
+    """
+    A single counter or gauge value.
+    """
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    """
+    Monotonically increasing count, e.g. of handled updates.
+    """
+    kind = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+
+class Gauge(_Metric):
+    """
+    Value that goes up and down, e.g. calls in progress.
+    """
+    kind = "gauge"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+
+class _HistogramValue:
+    """
+    Bucket counts, sum and count of the observations of one label combination.
+    """
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimates a quantile by linear interpolation within its bucket, as
+        Prometheus' histogram_quantile() does.
+
+        Args:
+            q (float): Quantile between 0 and 1.
+
+        Returns:
+            float: The estimate, or NaN without observations.
+        """
+        with self._lock:
+            counts = list(self.counts)
+            total = self.count
+        if not total:
+            return math.nan
+
+        rank = q * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if count and cumulative + count >= rank:
+                if index == len(self.buckets):
+                    # Beyond the last bucket only its lower bound is known
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values, e.g. latencies in seconds.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        """
+        Args:
+            name (str): Metric name.
+            documentation (str): Help text of the metric.
+            labelnames (tuple): Names of the labels, in order.
+            buckets (tuple): Upper bounds of the buckets, in increasing order.
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def collect(self) -> list[str]:
+        lines = super().collect()
+        lines.append(f"# HELP {self.name}_quantile Quantiles of {self.name} estimated from its buckets.")
+        lines.append(f"# TYPE {self.name}_quantile gauge")
+        for values, child in sorted(self._children.items()):
+            for q in QUANTILES:
+                labels = _format_labels(self.labelnames, values, f'quantile="{q}"')
+                lines.append(f"{self.name}_quantile{labels} {_format_value(child.quantile(q))}")
+        return lines
+
+    def _collect_child(self, values: tuple, child: _HistogramValue) -> list[str]:
+        with child._lock:
+            counts = list(child.counts)
+            total, total_sum = child.count, child.sum
+
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, f'le="{_format_value(bound)}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total_sum)}")
+        lines.append(f"{self.name}_count{labels} {total}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Collection of metric families that are exported together.
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: dict[str, Callable[[], None]] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, name: str, collect: Callable[[], None]):
+        """
+        Registers a callback that updates metrics right before they are rendered.
+        A collector registered again under the same name replaces the previous one.
+
+        Args:
+            name (str): Name of the collector.
+            collect (Callable[[], None]): Callback that sets metric values.
+        """
+        self._collectors[name] = collect
+
+    def render(self) -> str:
+        """
+        Returns all metrics in the Prometheus text exposition format.
+        """
+        for name, collect in list(self._collectors.items()):
+            try:
+                collect()
+            except Exception as e:
+                logger.warning(f"Metrics collector '{name}' failed: {e}")
+
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+HANDLER_DURATION = registry.histogram(
+    "bot_handler_duration_seconds", "Time spent in update handlers.", ("handler",))
+HANDLER_CALLS = registry.counter(
+    "bot_handler_calls_total", "Update handler calls by outcome.", ("handler", "outcome"))
+HANDLER_IN_FLIGHT = registry.gauge(
+    "bot_handler_in_flight", "Update handler calls in progress.", ("handler",))
+
+OUTBOUND_DURATION = registry.histogram(
+    "bot_outbound_duration_seconds", "Time spent in calls to external services and the databases.",
+    ("service", "operation"))
+OUTBOUND_CALLS = registry.counter(
+    "bot_outbound_calls_total", "Calls to external services and the databases by outcome.",
+    ("service", "operation", "outcome"))
+OUTBOUND_IN_FLIGHT = registry.gauge(
+    "bot_outbound_in_flight", "Calls to external services and the databases in progress.",
+    ("service", "operation"))
+
+CACHE_REQUESTS = registry.counter(
+    "bot_cache_requests_total", "Cache lookups by result.", ("cache", "result"))
+CACHE_EVICTIONS = registry.counter(
+    "bot_cache_evictions_total", "Entries evicted from a cache to stay within its limits.", ("cache",))
+CACHE_ENTRIES = registry.gauge(
+    "bot_cache_entries", "Entries in a cache.", ("cache",))
+CACHE_BYTES = registry.gauge(
+    "bot_cache_bytes", "Estimated memory used by the entries of a cache.", ("cache",))
+
+# Keys of a cache's stats() mapped to the result label of CACHE_REQUESTS
+_CACHE_RESULTS = {"hits": "hit", "similar_hits": "similar_hit", "misses": "miss"}
+
+
+class _Timer:
+    """
+    Records the duration, outcome and concurrency of a block of code.
+
+    Usable as a synchronous and as an asynchronous context manager.
+    """
+    __slots__ = ("duration", "in_flight", "success", "error", "_start")
+
+    def __init__(self, duration: _HistogramValue, in_flight: _Value, success: _Value, error: _Value):
+        self.duration = duration
+        self.in_flight = in_flight
+        self.success = success
+        self.error = error
+
+    def __enter__(self):
+        self.in_flight.inc()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration.observe(time.perf_counter() - self._start)
+        self.in_flight.dec()
+        (self.success if exc_type is None else self.error).inc()
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+@functools.lru_cache(maxsize=None)
+def _outbound_children(service: str, operation: str) -> tuple:
+    return (
+        OUTBOUND_DURATION.labels(service, operation),
+        OUTBOUND_IN_FLIGHT.labels(service, operation),
+        OUTBOUND_CALLS.labels(service, operation, "success"),
+        OUTBOUND_CALLS.labels(service, operation, "error"),
+    )
+
+
+def track(service: str, operation: str) -> _Timer:
+    """
+    Times a call to an external service or a database.
+
+    Example:
+        async with track("openai", "chat.completions"):
+            ...
+
+    Args:
+        service (str): Called service, e.g. 'openai' or 'sqlite'.
+        operation (str): Operation of the service.
+
+    Returns:
+        A context manager that records the call when it exits.
+    """
+    return _Timer(*_outbound_children(service, operation))
+
+
+def instrument_handler(name: str, callback):
+    """
+    Wraps an update handler callback so that its calls are measured.
+
+    Args:
+        name (str): Handler label, e.g. the command.
+        callback (Callable): Coroutine function called with (update, context).
+
+    Returns:
+        Callable: The wrapped callback.
+    """
+    children = (
+        HANDLER_DURATION.labels(name),
+        HANDLER_IN_FLIGHT.labels(name),
+        HANDLER_CALLS.labels(name, "success"),
+        HANDLER_CALLS.labels(name, "error"),
+    )
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        with _Timer(*children):
+            return await callback(update, context)
+
+    return wrapper
+
+
+def watch_cache(name: str, stats: Callable[[], dict]):
+    """
+    Exports the counters of a cache, read whenever metrics are scraped.
+
+    Args:
+        name (str): Cache label, e.g. 'chat_history'.
+        stats (Callable[[], dict]): Returns the cache's counters: 'hits' and 'misses', and
+                                    optionally 'similar_hits', 'evictions', 'entries' (or 'users'
+                                    for caches keyed by user) and 'bytes'.
+    """
+    def collect():
+        values = stats()
+        for key, result in _CACHE_RESULTS.items():
+            if key in values:
+                CACHE_REQUESTS.labels(name, result).set(values[key])
+        if "evictions" in values:
+            CACHE_EVICTIONS.labels(name).set(values["evictions"])
+        entries = values.get("entries", values.get("users"))
+        if entries is not None:
+            CACHE_ENTRIES.labels(name).set(entries)
+        if "bytes" in values:
+            CACHE_BYTES.labels(name).set(values["bytes"])
+
+    registry.add_collector(f"cache:{name}", collect)
+
+
+class MetricsServer:
+    """
+    aiohttp server that exposes a metrics registry on `/metrics`.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9100, metrics: MetricsRegistry = registry):
+        """
+        Args:
+            host (str): Interface to listen on; local only by default.
+            port (int): Port to listen on.
+            metrics (MetricsRegistry): Registry to export.
+        """
+        self.host = host
+        self.port = port
+        self.metrics = metrics
+        self._runner: web.AppRunner = None
+
+    async def start(self):
+        """
+        Starts serving the metrics. If the address cannot be bound, the
+        error is logged and the bot keeps running without the endpoint.
+        """
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        try:
+            await web.TCPSite(self._runner, self.host, self.port).start()
+        except OSError as e:
+            # Metrics are optional: a taken port must not keep the bot from starting
+            logger.error(f"Metrics server could not listen on {self.host}:{self.port}, metrics are disabled: {e}")
+            await self._runner.cleanup()
+            self._runner = None
+            return
+        logger.info(f"Metrics server listening on {self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        """
+        Stops serving the metrics.
+        """
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+            logger.info("Metrics server stopped.")
+
+    async def _handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(body=self.metrics.render().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
@@ -0,0 +1,85 @@
+import asyncio
+import concurrent.futures
+import logging
+from concurrent.futures.process import BrokenProcessPool
+
+from tools import setup_logger
+from tools.html_extractor import extract_text_from_bytes
+
+# Initialize the logger configuration
+setup_logger()
+logger = logging.getLogger(__name__)
+
+
+class ParsePool:
+    """
+    Worker pool that extracts page text away from the asyncio event loop.
+
+    Parsing runs in worker processes, so it does not hold the GIL of the
+    process that dispatches Telegram updates. If processes are not available
+    on the platform, or the process pool breaks, a thread pool is used
+    instead. At most `max_pending` jobs are submitted at a time; further
+    callers wait for a free slot, which applies backpressure to busy searches.
+    """
+
+    def __init__(self, workers: int, max_pending: int = 32, use_processes: bool = True):
+        """
+        Args:
+            workers (int): Number of worker processes or threads.
+            max_pending (int): Maximum number of jobs submitted to the workers at once.
+            use_processes (bool): Use worker processes; threads are used otherwise.
+        """
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self._executor = None
+        self._slots: asyncio.Semaphore = None
+
+        if use_processes:
+            try:
+                self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+            except (OSError, NotImplementedError, ImportError) as e:
+                logger.warning("Process pool is not available, using threads for parsing: %s", e)
+        if self._executor is None:
+            self._use_threads()
+
+    def _use_threads(self):
+        """
+        Replaces the current executor with a thread pool.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix="parse-worker"
+        )
+
+    async def extract_text(self, data: bytes, encoding: str, limit: int) -> str:
+        """
+        Extracts paragraph text from a downloaded HTML document in a worker.
+
+        Args:
+            data (bytes): The raw HTML document.
+            encoding (str): Character set of the document, or None for UTF-8.
+            limit (int): Maximum number of characters to return.
+
+        Returns:
+            str: Text of the document's paragraphs, joined by newlines.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(self._executor, extract_text_from_bytes, data, encoding, limit)
+            except (BrokenProcessPool, OSError) as e:
+                if isinstance(self._executor, concurrent.futures.ProcessPoolExecutor):
+                    logger.warning("Parse process pool is broken, switching to threads: %s", e)
+                    self._use_threads()
+                return await loop.run_in_executor(self._executor, extract_text_from_bytes, data, encoding, limit)
+
+    def shutdown(self):
+        """
+        Stops the workers.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
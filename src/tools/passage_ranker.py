@@ -0,0 +1,157 @@
+"""
+Local BM25 ranking of web page passages against a user question.
+
+Pages are split into short passages, scored with Okapi BM25 and the best
+passages are packed into a character budget, so the prompt carries the most
+relevant parts of every fetched page instead of one arbitrary page.
+"""
+import math
+import re
+from collections import Counter
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+_WORD = re.compile(r"\w+")
+_SENTENCE_END = re.compile(r"(?<=[.!?。])\s+")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Splits text into lower-cased terms.
+
+    Words written without spaces between morphemes (e.g. Korean with
+    particles) are also indexed by their character bigrams, so that
+    different inflections of the same word still match.
+
+    Args:
+        text (str): Text to tokenize.
+
+    Returns:
+        list[str]: Terms of the text.
+    """
+    terms = []
+    for word in _WORD.findall(text.lower()):
+        terms.append(word)
+        if len(word) > 2 and not word.isascii():
+            terms.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return terms
+
+
+def split_passages(text: str, max_chars: int = 400) -> list[str]:
+    """
+    Splits page text into passages of at most about `max_chars` characters.
+
+    Paragraphs are kept whole when they fit; longer paragraphs are split at
+    sentence boundaries.
+
+    Args:
+        text (str): Page text with paragraphs separated by newlines.
+        max_chars (int): Target maximum length of a passage.
+
+    Returns:
+        list[str]: Passages in page order.
+    """
+    passages = []
+    for paragraph in text.split("\n"):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            passages.append(paragraph)
+            continue
+
+        current = ""
+        for sentence in _SENTENCE_END.split(paragraph):
+            if current and len(current) + len(sentence) + 1 > max_chars:
+                passages.append(current)
+                current = ""
+            current = f"{current} {sentence}".strip()
+            while len(current) > max_chars:
+                passages.append(current[:max_chars])
+                current = current[max_chars:]
+        if current:
+            passages.append(current)
+    return passages
+
+
+def bm25_scores(query: str, passages: list[str]) -> list[float]:
+    """
+    Scores passages against a query with Okapi BM25.
+
+    Args:
+        query (str): The user question.
+        passages (list[str]): Passages to score.
+
+    Returns:
+        list[float]: Score of every passage, in the same order.
+    """
+    documents = [Counter(tokenize(passage)) for passage in passages]
+    if not documents:
+        return []
+
+    lengths = [sum(document.values()) for document in documents]
+    average_length = sum(lengths) / len(lengths) or 1.0
+    document_frequency = Counter(term for document in documents for term in document)
+    total = len(documents)
+
+    scores = []
+    query_terms = set(tokenize(query))
+    for document, length in zip(documents, lengths):
+        score = 0.0
+        for term in query_terms:
+            frequency = document.get(term)
+            if not frequency:
+                continue
+            idf = math.log(1 + (total - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+            score += idf * frequency * (K1 + 1) / (frequency + K1 * (1 - B + B * length / average_length))
+        scores.append(score)
+    return scores
+
+
+def pack_passages(query: str, pages: list[dict[str, str]], budget: int, max_passage_chars: int = 400) -> str:
+    """
+    Selects the passages most relevant to a query from several pages.
+
+    Passages are chosen by BM25 score until the character budget is used;
+    passages that share no term with the query are only used when no passage
+    matches at all. The selected passages are then emitted grouped by page
+    in their original order, each page headed by its title.
+
+    Args:
+        query (str): The user question.
+        pages (list[dict[str, str]]): Pages with 'title' and 'content', in search ranking order.
+        budget (int): Maximum number of passage characters to include.
+        max_passage_chars (int): Target maximum length of a passage.
+
+    Returns:
+        str: The packed passages.
+    """
+    candidates = []
+    for page_index, page in enumerate(pages):
+        for passage_index, passage in enumerate(split_passages(page.get("content", ""), max_passage_chars)):
+            candidates.append((page_index, passage_index, passage))
+
+    scores = bm25_scores(query, [passage for _, _, passage in candidates])
+    # Higher score first; on ties, prefer higher-ranked pages and earlier passages
+    order = sorted(range(len(candidates)), key=lambda i: (-scores[i], candidates[i][0], candidates[i][1]))
+
+    any_match = any(score > 0 for score in scores)
+    selected = []
+    used = 0
+    for i in order:
+        passage = candidates[i][2]
+        if (any_match and scores[i] <= 0) or used + len(passage) + 1 > budget:
+            continue
+        selected.append(candidates[i])
+        used += len(passage) + 1
+
+    sections = []
+    current_page = None
+    for page_index, _, passage in sorted(selected):
+        if page_index != current_page:
+            current_page = page_index
+            sections.append(f"[{page_index + 1}] {pages[page_index].get('title', '')}")
+        sections.append(passage)
+    return "\n".join(sections)
@@ -0,0 +1,362 @@
+"""
+Client-side rate limiting, retries and circuit breaking for upstream APIs.
+
+Requests and tokens per minute are tracked with token buckets that are kept
+in sync with the provider's rate limit headers. Failed calls are retried
+with jittered exponential backoff, and a circuit breaker stops sending
+requests for a while when the upstream keeps failing.
+"""
+import asyncio
+import logging
+import random
+import re
+import time
+from typing import Awaitable, Callable, Mapping
+
+from tools import setup_logger
+
+# Initialize the logger configuration
+setup_logger()
+logger = logging.getLogger(__name__)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised when a call is refused because the circuit breaker is open.
+    """
+
+
+def parse_duration(value: str) -> float:
+    """
+    Parses a rate limit reset duration such as '20ms', '1s' or '6m0s'.
+
+    Args:
+        value (str): Duration from a rate limit header, or plain seconds.
+
+    Returns:
+        float: Duration in seconds, or None if it cannot be parsed.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+class TokenBucket:
+    """
+    Token bucket that refills continuously up to its capacity.
+    """
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        """
+        Args:
+            capacity (float): Maximum number of tokens, refilled over one period.
+            period (float): Seconds needed to refill an empty bucket.
+        """
+        self.capacity = max(1.0, float(capacity))
+        self.period = period
+        self.tokens = self.capacity
+        self._updated_at = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        """
+        Returns the number of tokens added per second.
+        """
+        return self.capacity / self.period
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def try_acquire(self, amount: float = 1.0) -> float:
+        """
+        Takes `amount` tokens if they are available.
+
+        Args:
+            amount (float): Number of tokens to take; capped at the capacity.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the seconds until they are available.
+        """
+        amount = min(amount, self.capacity)
+        self._refill()
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    async def acquire(self, amount: float = 1.0):
+        """
+        Waits until `amount` tokens are available and takes them.
+
+        Args:
+            amount (float): Number of tokens to take; capped at the capacity.
+        """
+        while True:
+            wait = self.try_acquire(amount)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def adjust(self, amount: float):
+        """
+        Takes (or, if negative, returns) tokens without waiting, e.g. once the
+        real cost of a call is known. The bucket may go below zero.
+
+        Args:
+            amount (float): Number of tokens to take.
+        """
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+    def sync(self, limit: float = None, remaining: float = None):
+        """
+        Aligns the bucket with the limits reported by the provider.
+
+        Args:
+            limit (float, optional): Tokens allowed per period.
+            remaining (float, optional): Tokens left according to the provider.
+        """
+        self._refill()
+        if limit:
+            self.capacity = float(limit)
+        if remaining is not None:
+            # Other clients may share the same quota, so trust the lower count
+            self.tokens = min(self.tokens, float(remaining))
+
+
+class CircuitBreaker:
+    """
+    Stops calls to an upstream that keeps failing.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    are refused for `reset_timeout` seconds. Afterwards a single trial call is
+    let through; it closes the circuit on success and reopens it on failure.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Args:
+            failure_threshold (int): Consecutive failures that open the circuit.
+            reset_timeout (float): Seconds the circuit stays open.
+        """
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: float = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        """
+        Returns 'closed', 'open' or 'half_open'.
+        """
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def before_call(self) -> bool:
+        """
+        Checks whether a call may be made.
+
+        Returns:
+            bool: True if the call is the trial call of a half-open circuit;
+                  the caller must then end it with `record_success`,
+                  `record_failure` or `release_trial`.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or a trial call is already running.
+        """
+        state = self.state
+        if state == "closed":
+            return False
+        if state == "half_open" and not self._trial_running:
+            self._trial_running = True
+            return True
+        retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+        raise CircuitOpenError(f"Upstream is unavailable, retry in {retry_in:.0f} seconds")
+
+    def record_success(self):
+        """
+        Closes the circuit after a successful call.
+        """
+        self.failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    def release_trial(self):
+        """
+        Ends a trial call without a verdict, e.g. when it was cancelled,
+        so that the next call becomes the trial.
+        """
+        self._trial_running = False
+
+    def record_failure(self):
+        """
+        Counts a failed call and opens the circuit if the threshold is reached.
+        """
+        self.failures += 1
+        if self._trial_running or self.failures >= self.failure_threshold:
+            if self._opened_at is None or self._trial_running:
+                logger.warning("Circuit opened after %d consecutive failures.", self.failures)
+            self._opened_at = time.monotonic()
+        self._trial_running = False
+
+
+class RateLimiter:
+    """
+    Runs upstream calls within request and token rate limits, retrying
+    transient failures.
+
+    Retries use exponential backoff with full jitter, or the delay requested
+    by the upstream's Retry-After header. A rate limit response pauses every
+    caller, not only the one that received it, so the limiter settles at the
+    provider's limit instead of repeatedly overshooting it.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        is_retryable: Callable[[Exception], bool],
+        max_retries: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+        breaker: CircuitBreaker = None
+    ):
+        """
+        Args:
+            requests_per_minute (float): Requests allowed per minute.
+            tokens_per_minute (float): Tokens allowed per minute.
+            is_retryable (Callable[[Exception], bool]): Tells whether a failed call may be retried.
+            max_retries (int): Retries after the first attempt.
+            base_delay (float): Backoff delay of the first retry in seconds.
+            max_delay (float): Upper bound of a backoff delay in seconds.
+            breaker (CircuitBreaker, optional): Circuit breaker; a default one is created if omitted.
+        """
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.is_retryable = is_retryable
+        self.max_retries = max(0, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self._paused_until = 0.0
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Returns the jittered delay before retry number `attempt` (starting at 0).
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """
+        Syncs the buckets with OpenAI style `x-ratelimit-*` response headers.
+
+        Args:
+            headers (Mapping[str, str]): Response headers.
+        """
+        if not headers:
+            return
+        for bucket, suffix in ((self.requests, "requests"), (self.tokens, "tokens")):
+            limit = headers.get(f"x-ratelimit-limit-{suffix}")
+            remaining = headers.get(f"x-ratelimit-remaining-{suffix}")
+            try:
+                bucket.sync(
+                    limit=float(limit) if limit else None,
+                    remaining=float(remaining) if remaining else None
+                )
+            except ValueError:
+                logger.warning("Ignoring malformed rate limit headers for %s.", suffix)
+
+    @staticmethod
+    def _retry_after(error: Exception) -> float:
+        """
+        Returns the delay requested by the upstream for a failed call, if any.
+        """
+        headers = getattr(getattr(error, "response", None), "headers", None)
+        if not headers:
+            return None
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms:
+            try:
+                return float(retry_after_ms) / 1000
+            except ValueError:
+                pass
+        return parse_duration(headers.get("retry-after"))
+
+    async def call(self, factory: Callable[[], Awaitable], estimated_tokens: int = 1):
+        """
+        Runs a call once the rate limits allow it, retrying transient failures.
+
+        Args:
+            factory (Callable[[], Awaitable]): Creates the awaitable that performs the call.
+            estimated_tokens (int): Tokens the call is expected to use.
+
+        Returns:
+            Any: Result of the call.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker refuses the call.
+            Exception: The last error of the call if it is not retryable or retries are exhausted.
+        """
+        attempt = 0
+        while True:
+            trial = self.breaker.before_call()
+            try:
+                pause = self._paused_until - time.monotonic()
+                if pause > 0:
+                    await asyncio.sleep(pause)
+                await self.requests.acquire(1)
+                await self.tokens.acquire(estimated_tokens)
+
+                try:
+                    result = await factory()
+                except Exception as e:
+                    status_code = getattr(e, "status_code", None)
+                    if trial:
+                        # Any answer of the upstream, even a refusal, shows that it is reachable again
+                        if status_code is not None and (status_code == 429 or not self.is_retryable(e)):
+                            self.breaker.record_success()
+                        else:
+                            self.breaker.record_failure()
+                    if not self.is_retryable(e):
+                        raise
+                    # Rate limit responses mean the upstream is healthy but busy
+                    if status_code != 429 and not trial:
+                        self.breaker.record_failure()
+                    if attempt >= self.max_retries:
+                        logger.error("Upstream call failed after %d attempts: %s", attempt + 1, e)
+                        raise
+
+                    delay = self._retry_after(e)
+                    if delay is not None:
+                        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                    else:
+                        delay = self.backoff(attempt)
+                    logger.warning("Upstream call failed (%s), retry %d in %.2f seconds.", e, attempt + 1, delay)
+                    await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+
+                self.breaker.record_success()
+                return result
+            finally:
+                # Cancelled or otherwise unfinished trials must not keep the circuit locked
+                if trial:
+                    self.breaker.release_trial()
@@ -0,0 +1,140 @@
+import asyncio
+from collections import deque, defaultdict
+from typing import Awaitable, Callable, Hashable
+
+
+class SchedulerBusyError(Exception):
+    """
+    Raised when a user already has too many requests waiting.
+    """
+
+
+class RequestScheduler:
+    """
+    Fair scheduler for calls to a shared upstream API.
+
+    At most `max_concurrent` calls run at once, and at most `max_per_user`
+    of them belong to the same user. Waiting calls are started round-robin
+    across users, so one user sending many requests cannot starve the others.
+    Calls submitted with the same key while an identical call is still
+    pending share its result instead of being sent again.
+    """
+
+    def __init__(self, max_concurrent: int = 8, max_per_user: int = 2, max_queued_per_user: int = 5):
+        """
+        Args:
+            max_concurrent (int): Maximum number of calls running at once.
+            max_per_user (int): Maximum number of calls of a single user running at once.
+            max_queued_per_user (int): Maximum number of waiting calls per user.
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_per_user = max(1, max_per_user)
+        self.max_queued_per_user = max(1, max_queued_per_user)
+
+        self._queues: dict[Hashable, deque] = {}
+        self._ready: deque = deque()
+        self._active: dict[Hashable, int] = defaultdict(int)
+        self._running = 0
+        self._pending_keys: dict[Hashable, asyncio.Future] = {}
+
+    @property
+    def running(self) -> int:
+        """
+        Returns the number of calls currently running.
+        """
+        return self._running
+
+    @property
+    def waiting(self) -> int:
+        """
+        Returns the number of calls waiting for a slot.
+        """
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def submit(self, user_id: Hashable, key: Hashable, factory: Callable[[], Awaitable]):
+        """
+        Runs a call once a slot is available and returns its result.
+
+        Args:
+            user_id (Hashable): User the call is made for.
+            key (Hashable): Identity of the call used for deduplication, or None to never share it.
+            factory (Callable[[], Awaitable]): Creates the awaitable that performs the call.
+
+        Returns:
+            Any: Result of the call.
+
+        Raises:
+            SchedulerBusyError: If the user already has `max_queued_per_user` calls waiting.
+        """
+        if key is not None and key in self._pending_keys:
+            return await asyncio.shield(self._pending_keys[key])
+
+        queue = self._queues.get(user_id)
+        if queue is not None and len(queue) >= self.max_queued_per_user:
+            raise SchedulerBusyError(f"Too many pending requests for user {user_id}")
+
+        future = asyncio.get_running_loop().create_future()
+        if key is not None:
+            self._pending_keys[key] = future
+            future.add_done_callback(lambda _: self._pending_keys.pop(key, None))
+
+        if queue is None:
+            queue = self._queues[user_id] = deque()
+            self._ready.append(user_id)
+        queue.append((factory, future))
+        self._dispatch()
+
+        # Shield the shared future so that a cancelled caller does not cancel other waiters
+        return await asyncio.shield(future)
+
+    def _dispatch(self):
+        """
+        Starts waiting calls, round-robin across users, while slots are free.
+        """
+        while self._running < self.max_concurrent and self._ready:
+            for _ in range(len(self._ready)):
+                user_id = self._ready.popleft()
+                if self._active[user_id] >= self.max_per_user:
+                    self._ready.append(user_id)
+                    continue
+
+                queue = self._queues[user_id]
+                factory, future = queue.popleft()
+                if queue:
+                    self._ready.append(user_id)
+                else:
+                    del self._queues[user_id]
+                self._start(user_id, factory, future)
+                break
+            else:
+                # Every user with waiting calls is at their own limit
+                return
+
+    def _start(self, user_id: Hashable, factory: Callable[[], Awaitable], future: asyncio.Future):
+        """
+        Runs a call and releases its slot when it completes.
+        """
+        self._running += 1
+        self._active[user_id] += 1
+
+        def finish(task: asyncio.Future):
+            self._running -= 1
+            self._active[user_id] -= 1
+            if not self._active[user_id]:
+                del self._active[user_id]
+
+            if not future.done():
+                if task.cancelled():
+                    future.cancel()
+                elif task.exception() is not None:
+                    future.set_exception(task.exception())
+                else:
+                    future.set_result(task.result())
+            self._dispatch()
+
+        try:
+            task = asyncio.ensure_future(factory())
+        except Exception as e:
+            task = asyncio.get_running_loop().create_future()
+            task.set_exception(e)
+        task.add_done_callback(finish)
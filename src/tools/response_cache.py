@@ -0,0 +1,198 @@
+"""
+In-memory cache of GPT completions for repeated questions.
+
+Completions are keyed by a hash of the system prompt and model parameters
+plus the normalized user prompt, so questions that only differ in case,
+spacing or closing punctuation share an entry. Optionally, a question that is not
+cached exactly can be answered by a cached question that is similar enough,
+compared with hashed character n-gram vectors.
+"""
+import hashlib
+import json
+import math
+import re
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+
+# Punctuation at the end of a question; symbols inside it can change its meaning
+_TRAILING_PUNCTUATION = re.compile(r"[?!.\s]+$")
+
+# Dimensions of the hashed n-gram vectors and the n-gram length
+VECTOR_DIMENSIONS = 1 << 16
+NGRAM = 3
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Normalizes a prompt so that trivially different spellings share a cache entry.
+
+    Args:
+        prompt (str): The user prompt.
+
+    Returns:
+        str: Case-folded prompt with collapsed whitespace and without trailing '?', '!' or '.'.
+    """
+    prompt = unicodedata.normalize("NFKC", prompt).casefold()
+    return _TRAILING_PUNCTUATION.sub("", " ".join(prompt.split()))
+
+
+def context_key(system_prompt: str, params: dict) -> str:
+    """
+    Returns a key identifying the system prompt and model parameters of a request.
+
+    Args:
+        system_prompt (str): Instruction for the GPT model.
+        params (dict): Model parameters that affect the completion.
+
+    Returns:
+        str: Hex digest of the system prompt and parameters.
+    """
+    data = json.dumps([system_prompt, params], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def ngram_vector(text: str) -> dict[int, float]:
+    """
+    Builds a unit-length vector of hashed character n-grams.
+
+    Args:
+        text (str): Normalized text.
+
+    Returns:
+        dict[int, float]: Sparse vector mapping hashed n-grams to weights.
+    """
+    padded = f" {text} "
+    counts: dict[int, float] = {}
+    for i in range(max(1, len(padded) - NGRAM + 1)):
+        index = zlib.crc32(padded[i:i + NGRAM].encode("utf-8")) % VECTOR_DIMENSIONS
+        counts[index] = counts.get(index, 0.0) + 1.0
+
+    norm = math.sqrt(sum(weight * weight for weight in counts.values()))
+    return {index: weight / norm for index, weight in counts.items()}
+
+
+def cosine_similarity(a: dict[int, float], b: dict[int, float]) -> float:
+    """
+    Returns the cosine similarity of two unit-length sparse vectors.
+    """
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(index, 0.0) for index, weight in a.items())
+
+
+class ResponseCache:
+    """
+    LRU cache of completions whose entries expire after a time-to-live.
+
+    Lookups first try the exact normalized prompt. If `similarity_threshold`
+    is set, the most similar cached prompt with the same system prompt and
+    parameters is used when its cosine similarity reaches the threshold.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600, similarity_threshold: float = 0.0):
+        """
+        Args:
+            max_entries (int): Maximum number of cached completions.
+            ttl (float): Seconds a completion stays valid.
+            similarity_threshold (float): Minimum similarity (0 to 1) of a near-match; 0 disables near-matches.
+        """
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        # (context key, normalized prompt) -> (response, vector, expires_at)
+        self._entries: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, context: str, prompt: str) -> str:
+        """
+        Returns the cached completion of a prompt, or None on a miss.
+
+        Args:
+            context (str): Key of the system prompt and model parameters, see `context_key`.
+            prompt (str): The user prompt.
+
+        Returns:
+            str: The cached completion or None.
+        """
+        now = time.monotonic()
+        key = (context, normalize_prompt(prompt))
+        entry = self._entries.get(key)
+        if entry is not None and entry[2] > now:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        if self.similarity_threshold > 0:
+            match = self._most_similar(context, key[1], now)
+            if match is not None:
+                self._entries.move_to_end(match)
+                self.similar_hits += 1
+                return self._entries[match][0]
+
+        self.misses += 1
+        return None
+
+    def _most_similar(self, context: str, normalized: str, now: float):
+        """
+        Returns the key of the most similar valid entry above the threshold, or None.
+        """
+        vector = ngram_vector(normalized)
+        best_key, best_score = None, self.similarity_threshold
+        expired = []
+        for key, (_, entry_vector, expires_at) in self._entries.items():
+            if expires_at <= now:
+                expired.append(key)
+                continue
+            if key[0] != context:
+                continue
+            score = cosine_similarity(vector, entry_vector)
+            if score >= best_score:
+                best_key, best_score = key, score
+
+        for key in expired:
+            del self._entries[key]
+        return best_key
+
+    def set(self, context: str, prompt: str, response: str):
+        """
+        Stores a completion, evicting the least recently used entry if the cache is full.
+
+        Args:
+            context (str): Key of the system prompt and model parameters, see `context_key`.
+            prompt (str): The user prompt.
+            response (str): The completion to cache.
+        """
+        normalized = normalize_prompt(prompt)
+        vector = ngram_vector(normalized) if self.similarity_threshold > 0 else None
+        key = (context, normalized)
+        self._entries[key] = (response, vector, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns hit/miss counters and the current size of the cache.
+
+        Returns:
+            dict[str, int]: Monitoring counters.
+        """
+        return {
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+        }
+
+    def clear(self):
+        """
+        Removes every entry.
+        """
+        self._entries.clear()
@@ -1,21 +1,159 @@
+import logging
+import re
+
 from telegram import Update, ReplyKeyboardMarkup
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes
 
 from tools import text2markdown
+from tools.logger import setup_logger
+from tools.send_queue import send_queue
+from tools.message_tracker import track_message
+
+# Initialize the logger configuration
+setup_logger()
+logger = logging.getLogger(__name__)
+
+# Maximum length of a Telegram text message
+MESSAGE_LIMIT = 4096
+
+# Code blocks, which are split line by line and re-fenced in every chunk
+_CODE_BLOCK = re.compile(r"```(.*?)(?:```|\Z)", re.DOTALL)
+
+# Boundaries tried in order when a piece of text is too long: paragraphs, lines, sentences, words
+_BOUNDARIES = (
+    re.compile(r"(?<=\n\n)"),
+    re.compile(r"(?<=\n)"),
+    re.compile(r"(?<=[.!?。] )"),
+    re.compile(r"(?<= )"),
+)
+
+def _fits(text: str, limit: int) -> bool:
+    return len(text2markdown(text)) <= limit
+
+def _split_text(text: str, limit: int, level: int = 0) -> list[str]:
+    """
+    Splits text outside code blocks into pieces that each fit into a message,
+    using the coarsest boundary that works.
+    """
+    if _fits(text, limit):
+        return [text]
+    if level == len(_BOUNDARIES):
+        # No boundary left: cut, allowing for every character to be escaped
+        step = max(1, limit // 2)
+        return [text[i:i + step] for i in range(0, len(text), step)]
+
+    pieces = []
+    for part in _BOUNDARIES[level].split(text):
+        if part:
+            pieces.extend(_split_text(part, limit, level + 1))
+    return pieces
+
+def _split_code_block(content: str, limit: int) -> list[str]:
+    """
+    Splits a code block into pieces that are complete code blocks themselves.
+    """
+    block = f"```{content}```"
+    if _fits(block, limit):
+        return [block]
+
+    language, _, body = content.partition("\n")
+    opening = f"```{language}\n"
+    # Room left for code after the fences; code lines too long for it are cut
+    room = max(1, (limit - len(opening) - len("\n```")) // 2)
+
+    pieces = []
+    current = ""
+    for line in body.splitlines(keepends=True):
+        for start in range(0, max(1, len(line)), room):
+            part = line[start:start + room]
+            if current and not _fits(f"{opening}{current}{part}```", limit):
+                pieces.append(f"{opening}{current}```")
+                current = ""
+            current += part
+    if current:
+        pieces.append(f"{opening}{current}```")
+    return pieces
+
+def split_message(text: str, limit: int = MESSAGE_LIMIT) -> list[str]:
+    """
+    Splits text into chunks whose MarkdownV2 rendering fits into one Telegram message.
+
+    Chunks end at paragraph boundaries where possible, then at line, sentence
+    and word boundaries. Text is split before it is escaped, so escape
+    sequences are never cut, and code blocks that do not fit are split line
+    by line with every part fenced again.
+
+    Args:
+        text (str): The message content.
+        limit (int): Maximum length of an escaped chunk.
+
+    Returns:
+        list[str]: The chunks, in order, not yet escaped.
+    """
+    if _fits(text, limit):
+        return [text]
+
+    pieces = []
+    position = 0
+    for match in _CODE_BLOCK.finditer(text):
+        pieces.extend(_split_text(text[position:match.start()], limit))
+        pieces.extend(_split_code_block(match.group(1), limit))
+        position = match.end()
+    pieces.extend(_split_text(text[position:], limit))
+
+    # Pack the pieces greedily into as few chunks as possible
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and not _fits(current + piece, limit):
+            chunks.append(current)
+            current = ""
+        current += piece
+    chunks.append(current)
+    return [chunk for chunk in (chunk.strip() for chunk in chunks) if chunk]
 
 async def send_message(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, reply_markup: ReplyKeyboardMarkup = None):
     """
     Sends a message to the Telegram chat, optionally formatted in MarkdownV2.
 
+    Text longer than a Telegram message is split with `split_message` and sent
+    as several messages in order; the reply markup is attached to the last one.
+    A chunk whose markup Telegram cannot parse is sent as plain text.
+    Messages go through the shared send queue, which paces them to Telegram's
+    flood limits, and are remembered so that `/empty` can delete them.
+
     Args:
         update (Update): Telegram update object, containing message and chat details.
         context (ContextTypes.DEFAULT_TYPE): Context for the bot, providing access to the bot instance.
         text (str): The message content to be sent.
         reply_markup (ReplyKeyboardMarkup, optional): Keyboard layout for custom reply options in the chat.
+
+    Returns:
+        telegram.Message: The last message that was sent.
     """
-    await context.bot.send_message(
-        chat_id=update.effective_chat.id,
-        parse_mode="MarkdownV2",
-        text=text2markdown(text),
-        reply_markup=reply_markup
-    )
\ No newline at end of file
+    chat_id = update.effective_chat.id
+    chunks = split_message(text) or [text]
+
+    message = None
+    for index, chunk in enumerate(chunks):
+        markup = reply_markup if index == len(chunks) - 1 else None
+        try:
+            message = await send_queue.submit(chat_id, lambda: context.bot.send_message(
+                chat_id=chat_id,
+                parse_mode="MarkdownV2",
+                text=text2markdown(chunk),
+                reply_markup=markup
+            ))
+        except BadRequest as e:
+            if "can't parse entities" not in str(e).lower():
+                raise
+            # An entity may span two chunks, e.g. bold text across a sentence boundary, or be unbalanced
+            logger.debug("MarkdownV2 chunk rejected in chat ID %s, using plain text: %s", chat_id, e)
+            message = await send_queue.submit(chat_id, lambda: context.bot.send_message(
+                chat_id=chat_id,
+                text=chunk,
+                reply_markup=markup
+            ))
+        track_message(context, message.message_id)
+    return message
@@ -0,0 +1,204 @@
+"""
+Outbound queue for Telegram Bot API calls.
+
+Every message the bot sends, edits or deletes goes through one shared queue,
+so bursts from many handlers are paced to Telegram's flood limits instead
+of failing with RetryAfter errors. Calls are started in priority order
+(replies before edits before bulk deletions), limited by a global token
+bucket and a token bucket per chat, and retried after the delay Telegram
+asks for when a limit is hit anyway.
+"""
+import asyncio
+import itertools
+import logging
+import os
+import time
+from typing import Awaitable, Callable
+
+from telegram.error import RetryAfter
+
+from tools.logger import setup_logger
+from tools.rate_limiter import TokenBucket
+from tools.ttl_cache import TTLCache
+
+# Initialize the logger configuration
+setup_logger()
+logger = logging.getLogger(__name__)
+
+# Priorities of queued calls; lower values are sent first
+PRIORITY_REPLY = 0
+PRIORITY_EDIT = 1
+PRIORITY_BULK = 2
+
+# Telegram limits: ~30 calls per second overall, ~1 per second per chat (with short bursts)
+# and 20 per minute in groups
+GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "30"))
+CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", "1"))
+CHAT_BURST = int(os.getenv("SEND_CHAT_BURST", "3"))
+GROUP_RATE_PER_MINUTE = float(os.getenv("SEND_GROUP_RATE_PER_MINUTE", "20"))
+SEND_WORKERS = int(os.getenv("SEND_WORKERS", "8"))
+MAX_RETRIES = 5
+
+
+def retry_after_seconds(value) -> float:
+    """
+    Converts a RetryAfter delay, given in seconds or as a timedelta, to seconds.
+    """
+    return value.total_seconds() if hasattr(value, "total_seconds") else float(value)
+
+
+class SendQueue:
+    """
+    Priority queue of Bot API calls that respects global and per-chat rate limits.
+
+    A fixed number of workers take calls from the queue. A call whose chat
+    (or the bot as a whole) has no capacity left is put back with a timer
+    instead of blocking its worker, so a busy chat does not hold up others.
+    """
+
+    def __init__(self, global_rate: float = GLOBAL_RATE, chat_rate: float = CHAT_RATE, chat_burst: int = CHAT_BURST,
+                 group_rate_per_minute: float = GROUP_RATE_PER_MINUTE, workers: int = SEND_WORKERS,
+                 max_retries: int = MAX_RETRIES):
+        """
+        Args:
+            global_rate (float): Calls per second over all chats.
+            chat_rate (float): Calls per second in a private chat.
+            chat_burst (int): Calls a private chat may make at once before being paced.
+            group_rate_per_minute (float): Calls per minute in a group chat.
+            workers (int): Number of calls in progress at once.
+            max_retries (int): Retries of a call that was refused with RetryAfter.
+        """
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = max(1, chat_burst)
+        self.group_rate_per_minute = group_rate_per_minute
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+
+        self._global = TokenBucket(global_rate, period=1.0)
+        # Idle chats regain their full bucket, so their buckets can be forgotten
+        self._chats = TTLCache(max_entries=10000, ttl=60)
+        self._paused_until: dict[int, float] = {}
+        self._sequence = itertools.count()
+        self._queue: asyncio.PriorityQueue = None
+        self._tasks: list[asyncio.Task] = []
+        self._loop: asyncio.AbstractEventLoop = None
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        """
+        Returns the token bucket of a chat, creating it on first use.
+        """
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if chat_id < 0:
+                # Groups and channels have negative identifiers
+                bucket = TokenBucket(self.group_rate_per_minute, period=60.0)
+            else:
+                bucket = TokenBucket(self.chat_burst, period=self.chat_burst / self.chat_rate)
+        self._chats.set(chat_id, bucket)
+        return bucket
+
+    def _start(self):
+        """
+        Starts the workers on the running event loop.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.PriorityQueue()
+        self._tasks = [self._loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def submit(self, chat_id: int, factory: Callable[[], Awaitable], priority: int = PRIORITY_REPLY):
+        """
+        Queues a Bot API call and returns its result once it has been made.
+
+        Args:
+            chat_id (int): Chat the call is made in.
+            factory (Callable[[], Awaitable]): Creates the awaitable that performs the call.
+            priority (int): PRIORITY_REPLY, PRIORITY_EDIT or PRIORITY_BULK.
+
+        Returns:
+            Any: Result of the call.
+        """
+        if self._loop is not asyncio.get_running_loop():
+            self._start()
+
+        future = self._loop.create_future()
+        self._queue.put_nowait((priority, next(self._sequence), chat_id, factory, future, 0))
+        return await future
+
+    def _requeue(self, item: tuple, delay: float):
+        """
+        Puts a call back into the queue after `delay` seconds.
+        """
+        self._loop.call_later(delay, self._queue.put_nowait, item)
+
+    def _wait_time(self, chat_id: int) -> float:
+        """
+        Takes a token for a call in a chat, or returns the seconds until one is available.
+        """
+        paused_until = self._paused_until.get(chat_id)
+        if paused_until is not None:
+            wait = paused_until - time.monotonic()
+            if wait > 0:
+                return wait
+            del self._paused_until[chat_id]
+
+        bucket = self._chat_bucket(chat_id)
+        wait = bucket.try_acquire()
+        if wait:
+            return wait
+        wait = self._global.try_acquire()
+        if wait:
+            # Give the chat its token back until the call can actually be made
+            bucket.adjust(-1)
+        return wait
+
+    async def _worker(self):
+        """
+        Makes queued calls as the rate limits allow.
+        """
+        while True:
+            item = await self._queue.get()
+            priority, sequence, chat_id, factory, future, attempt = item
+            if future.done():
+                # The caller stopped waiting
+                continue
+
+            wait = self._wait_time(chat_id)
+            if wait:
+                self._requeue(item, wait)
+                continue
+
+            try:
+                result = await factory()
+            except RetryAfter as e:
+                delay = retry_after_seconds(e.retry_after)
+                self._paused_until[chat_id] = max(self._paused_until.get(chat_id, 0.0), time.monotonic() + delay)
+                if attempt < self.max_retries and not future.done():
+                    logger.warning("Flood limit reached in chat ID %s, retrying in %ss.", chat_id, delay, extra={"chat_id": chat_id})
+                    self._requeue((priority, sequence, chat_id, factory, future, attempt + 1), delay)
+                elif not future.done():
+                    future.set_exception(e)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+
+    async def close(self):
+        """
+        Stops the workers. Calls still queued are cancelled.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        if self._queue is not None:
+            while not self._queue.empty():
+                self._queue.get_nowait()[4].cancel()
+        self._loop = None
+
+
+# Queue shared by every command of the bot
+send_queue = SendQueue()
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import re
+import time
+
+from telegram import Update, Message, InlineKeyboardMarkup
+from telegram.ext import ContextTypes
+from telegram.error import BadRequest, RetryAfter
+
+from tools import text2markdown, send_message, setup_logger
+from tools.send_message import MESSAGE_LIMIT
+from tools.send_queue import send_queue, retry_after_seconds, PRIORITY_EDIT
+from tools.message_tracker import track_message
+
+# Initialize the logger configuration
+setup_logger()
+logger = logging.getLogger(__name__)
+
+_ESCAPED_CHAR = re.compile(r"\\.", re.DOTALL)
+
+# Closed inline code spans, whose content never opens or closes an entity
+_INLINE_CODE = re.compile(r"`[^`]*`")
+
+
+def render_partial_markdown(text: str) -> str:
+    """
+    Renders incomplete text as valid MarkdownV2.
+
+    The text is escaped with `text2markdown` in partial mode, then any
+    entity that is still open at the end (code block, inline code, bold,
+    italic) is closed, so a response that is cut off mid-stream can still be
+    parsed by Telegram.
+
+    Args:
+        text (str): Text received so far.
+
+    Returns:
+        str: MarkdownV2 text with all entities closed.
+    """
+    rendered = text2markdown(text, partial=True)
+
+    # Escaped characters never open or close an entity
+    bare = _ESCAPED_CHAR.sub("", rendered)
+    segments = bare.split("```")
+    if len(segments) % 2 == 0:
+        # The text stops inside a code block
+        return rendered + "\n```"
+
+    # Only text outside code blocks and inline code can contain formatting entities
+    outside = _INLINE_CODE.sub("", "".join(segments[0::2]))
+    closers = ""
+    if "`" in outside:
+        # The text stops inside inline code, which is closed before any formatting
+        outside = outside[:outside.index("`")]
+        closers = "`"
+    closers += "".join(marker for marker in ("_", "*") if outside.count(marker) % 2)
+    return rendered + closers
+
+
+class StreamingMessage:
+    """
+    Shows text that is still being generated by editing a single Telegram message.
+
+    Edits are coalesced so that the message is updated at most once per
+    `edit_interval` seconds, which keeps the bot within Telegram's edit limits.
+    Intermediate edits are rendered with `render_partial_markdown` and fall back
+    to plain text if Telegram still rejects the markup.
+    """
+
+    def __init__(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                 edit_interval: float = 1.0, placeholder: str = "…"):
+        """
+        Args:
+            update (Update): Telegram update object, containing message and chat details.
+            context (ContextTypes.DEFAULT_TYPE): Context for the bot, providing access to the bot instance.
+            edit_interval (float): Minimum number of seconds between two edits.
+            placeholder (str): Text shown until the first part of the response arrives.
+        """
+        self.update = update
+        self.context = context
+        self.chat_id = update.effective_chat.id
+        self.edit_interval = edit_interval
+        self.placeholder = placeholder
+
+        self.text = ""
+        self.message: Message = None
+        self._shown = None
+        self._next_edit_at = 0.0
+
+    async def start(self):
+        """
+        Sends the placeholder message that will be edited.
+        """
+        self.message = await send_queue.submit(
+            self.chat_id,
+            lambda: self.context.bot.send_message(chat_id=self.chat_id, text=self.placeholder)
+        )
+        track_message(self.context, self.message.message_id)
+        self._shown = self.placeholder
+        self._next_edit_at = time.monotonic() + self.edit_interval
+
+    async def append(self, delta: str):
+        """
+        Adds generated text and edits the message if the edit interval has passed.
+
+        Args:
+            delta (str): Newly generated text.
+        """
+        self.text += delta
+        if self.message is None or time.monotonic() < self._next_edit_at:
+            return
+
+        rendered = render_partial_markdown(self.text)
+        if len(rendered) > MESSAGE_LIMIT:
+            # The final text is sent in full by `finish`
+            return
+        await self._edit(rendered)
+
+    async def finish(self, text: str = None, reply_markup: InlineKeyboardMarkup = None) -> Message:
+        """
+        Shows the complete text in its final MarkdownV2 form.
+
+        Args:
+            text (str, optional): Final text. Defaults to the text appended so far.
+            reply_markup (InlineKeyboardMarkup, optional): Inline keyboard attached to the final message.
+
+        Returns:
+            telegram.Message: The message that shows the final text.
+        """
+        if text is not None:
+            self.text = text
+
+        rendered = text2markdown(self.text)
+        if self.message is None or len(rendered) > MESSAGE_LIMIT:
+            # Too long for a single edit: replace the streaming message with a regular reply
+            if self.message is not None:
+                await send_queue.submit(self.chat_id, self.message.delete, priority=PRIORITY_EDIT)
+            return await send_message(update=self.update, context=self.context, text=self.text, reply_markup=reply_markup)
+
+        await self._edit(rendered, final=True, reply_markup=reply_markup)
+        return self.message
+
+    async def _edit(self, rendered: str, final: bool = False, reply_markup: InlineKeyboardMarkup = None):
+        """
+        Edits the message, falling back to plain text when the markup is rejected.
+        """
+        if rendered == self._shown and reply_markup is None:
+            return
+
+        try:
+            await send_queue.submit(
+                self.chat_id,
+                lambda: self.message.edit_text(text=rendered, parse_mode="MarkdownV2", reply_markup=reply_markup),
+                priority=PRIORITY_EDIT
+            )
+        except RetryAfter as e:
+            logger.warning("Edit rate limit reached in chat ID %s, retrying in %ss.", self.chat_id, e.retry_after)
+            delay = retry_after_seconds(e.retry_after)
+            self._next_edit_at = time.monotonic() + delay
+            if final:
+                await asyncio.sleep(delay)
+                await self._edit(rendered, final, reply_markup)
+            return
+        except BadRequest as e:
+            if "message is not modified" in str(e).lower():
+                return
+            logger.debug("MarkdownV2 edit rejected in chat ID %s, using plain text: %s", self.chat_id, e)
+            await send_queue.submit(
+                self.chat_id,
+                lambda: self.message.edit_text(text=self.text, reply_markup=reply_markup),
+                priority=PRIORITY_EDIT
+            )
+
+        self._shown = rendered
+        self._next_edit_at = time.monotonic() + self.edit_interval
@@ -5,31 +5,71 @@ https://core.telegram.org/bots/api#formatting-options
 
 import re
 
-def text2markdown(text: str) -> str:
+# Escape tables: (character, replacement) pairs, the backslash first so that inserted escapes
+# are not escaped again. Chained str.replace calls each run in C and are several times faster
+# than str.translate with multi-character replacements or a regex with a Python callback.
+
+# Characters escaped outside code entities; * and _ are kept for bold and italic formatting
+_TEXT_TABLE = tuple((char, "\\" + char) for char in "\\[]()~>#+-=|{}.!`")
+
+# Inside pre and code entities only ` and \ must be escaped
+_CODE_TABLE = (("\\", "\\\\"), ("`", "\\`"))
+
+# Code blocks and inline code; an entity still open at the end of the text runs to the end
+_CODE_ENTITY = re.compile(r"```(?P<pre>.*?)(?:```|\Z)|`(?P<code>[^`\n]+)(?:`|\Z)", re.DOTALL)
+
+def _escape(text: str, table: tuple) -> str:
+    """
+    Applies an escape table to a piece of text.
+    """
+    for char, replacement in table:
+        if char in text:
+            text = text.replace(char, replacement)
+    return text
+
+def text2markdown(text: str, partial: bool = False) -> str:
     """
     Escapes special characters in a given markdown text according to the provided rules.
     This function avoids escaping characters used for Markdown formatting (like * for bold or italic).
 
+    Code blocks and inline code are kept as entities, and only ` and \\ are
+    escaped inside them; backticks that do not delimit code are escaped.
+    The text is escaped with precompiled escape tables.
+
     Args:
         text (str): The input string that needs to be escaped.
+        partial (bool): Whether the text is still being generated. A code entity
+                        that is open at the end is then kept open, so that the
+                        caller can close it, instead of escaping its backticks.
 
     Returns:
         str: The escaped string where markdown special characters are properly escaped.
     """
-    # Define the characters that need to be escaped in general
-    special_chars = r"_\*\[\]\(\)~>#\+\-=|{}.!"
-    
-    # Escape backslashes first to avoid double escaping
-    text = text.replace("\\", "\\\\")
-    
-    # Escape general special characters except those used for markdown formatting
-    # Avoid escaping * and _ inside bold and italic text, and similar
-    def escape_special(match):
-        if match.group(0) in ["*", "_"]:
-            return match.group(0)  # Don't escape * and _
-        return "\\" + match.group(0)  # Escape all other special characters
-
-    # Use a regular expression to find and escape special characters
-    text = re.sub(f"([{special_chars}])", escape_special, text)
-    
-    return text
\ No newline at end of file
+    if "`" not in text:
+        return _escape(text, _TEXT_TABLE)
+
+    parts = []
+    position = 0
+    search_from = 0
+    while True:
+        match = _CODE_ENTITY.search(text, search_from)
+        if match is None:
+            break
+
+        entity = match.group()
+        is_pre = match.group("pre") is not None
+        closed = (len(entity) >= 6 and entity.endswith("```")) if is_pre else entity.endswith("`")
+        if not closed and not partial:
+            # An unmatched delimiter is plain text; look for code after it
+            search_from = match.start() + (3 if is_pre else 1)
+            continue
+
+        parts.append(_escape(text[position:match.start()], _TEXT_TABLE))
+        if is_pre:
+            parts.append("```" + _escape(match.group("pre"), _CODE_TABLE) + ("```" if closed else ""))
+        else:
+            parts.append("`" + _escape(match.group("code"), _CODE_TABLE) + ("`" if closed else ""))
+        position = search_from = match.end()
+
+    parts.append(_escape(text[position:], _TEXT_TABLE))
+    return "".join(parts)
@@ -0,0 +1,92 @@
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    In-memory LRU cache whose entries expire after a time-to-live.
+
+    Each entry can override the default time-to-live, which allows for
+    example shorter lifetimes for negative results.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 600):
+        """
+        Args:
+            max_entries (int): Maximum number of entries kept in the cache.
+            ttl (float): Default number of seconds an entry stays valid.
+        """
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """
+        Returns the value of a key, or `default` if it is missing or expired.
+
+        Args:
+            key (Hashable): Cache key.
+            default (Any): Value returned on a miss.
+
+        Returns:
+            Any: The cached value or `default`.
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key, value, ttl: float = None):
+        """
+        Stores a value, evicting the least recently used entry if the cache is full.
+
+        Args:
+            key (Hashable): Cache key.
+            value (Any): Value to store.
+            ttl (float, optional): Seconds the entry stays valid. Defaults to the cache's ttl.
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """
+        Removes a key and returns its value.
+
+        Args:
+            key (Hashable): Cache key.
+            default (Any): Value returned if the key is missing.
+
+        Returns:
+            Any: The removed value or `default`.
+        """
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns hit/miss counters and the current size of the cache.
+
+        Returns:
+            dict[str, int]: Monitoring counters.
+        """
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def clear(self):
+        """
+        Removes every entry.
+        """
+        self._entries.clear()
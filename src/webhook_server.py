@@ -0,0 +1,117 @@
+"""
+Embedded HTTP server that receives Telegram updates by webhook.
+
+Telegram POSTs every update to the webhook path. Requests must carry the
+secret token that was registered with `setWebhook`; accepted updates are put
+on the PTB application's update queue and acknowledged immediately, so slow
+handlers never delay Telegram's delivery. `/healthz` reports that the process
+is alive and `/readyz` whether it currently accepts updates, for load
+balancers and orchestrators.
+"""
+import hmac
+import json
+import logging
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+
+from tools import setup_logger
+
+# Initialize the logger configuration
+setup_logger()
+logger = logging.getLogger(__name__)
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+# Telegram updates are small; larger bodies are rejected
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class WebhookServer:
+    """
+    aiohttp server that feeds webhook updates into a PTB application.
+    """
+
+    def __init__(self, application: Application, path: str = "/telegram", secret_token: str = None,
+                 host: str = "0.0.0.0", port: int = 8080):
+        """
+        Args:
+            application (telegram.ext.Application): Application that processes the updates.
+            path (str): URL path Telegram posts updates to.
+            secret_token (str, optional): Secret expected in the X-Telegram-Bot-Api-Secret-Token header.
+            host (str): Interface to listen on.
+            port (int): Port to listen on.
+        """
+        self.application = application
+        self.path = path
+        self.secret_token = secret_token
+        self.host = host
+        self.port = port
+        self.ready = False
+        self._runner: web.AppRunner = None
+
+    async def start(self):
+        """
+        Starts listening for webhook requests.
+        """
+        app = web.Application(client_max_size=MAX_BODY_BYTES)
+        app.router.add_post(self.path, self._handle_update)
+        app.router.add_get("/healthz", self._health)
+        app.router.add_get("/readyz", self._readiness)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info("Webhook server listening on %s:%s%s", self.host, self.port, self.path)
+
+    async def stop(self):
+        """
+        Stops accepting requests and closes the server.
+        """
+        self.ready = False
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+            logger.info("Webhook server stopped.")
+
+    async def _handle_update(self, request: web.Request) -> web.Response:
+        """
+        Validates a webhook request and queues its update.
+        """
+        if self.secret_token is not None:
+            token = request.headers.get(SECRET_TOKEN_HEADER, "")
+            if not hmac.compare_digest(token.encode(), self.secret_token.encode()):
+                logger.warning("Rejected webhook request with invalid secret token from %s", request.remote)
+                return web.Response(status=403)
+
+        if not self.ready:
+            # Telegram retries failed deliveries, so nothing is lost while starting or stopping
+            return web.Response(status=503)
+
+        try:
+            data = await request.json()
+            if not isinstance(data, dict):
+                # Valid JSON that is not an update object, e.g. a list or null
+                raise TypeError(f"expected a JSON object, got {type(data).__name__}")
+            update = Update.de_json(data, self.application.bot)
+        except (json.JSONDecodeError, ValueError, TypeError, KeyError) as e:
+            logger.warning("Rejected malformed webhook update: %s", e)
+            return web.Response(status=400)
+
+        await self.application.update_queue.put(update)
+        return web.Response()
+
+    async def _health(self, request: web.Request) -> web.Response:
+        """
+        Liveness probe: the process is running.
+        """
+        return web.json_response({"status": "ok"})
+
+    async def _readiness(self, request: web.Request) -> web.Response:
+        """
+        Readiness probe: the application is running and accepts updates.
+        """
+        if self.ready and self.application.running:
+            return web.json_response({"status": "ready", "pending_updates": self.application.update_queue.qsize()})
+        return web.json_response({"status": "not ready"}, status=503)
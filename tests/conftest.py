@@ -0,0 +1,19 @@
+"""
+Test setup: makes the modules in `src` importable and runs the tests in a
+temporary working directory, so that logs and chat databases stay out of
+the repository.
+"""
+import os
+import sys
+import tempfile
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_PATH)
+
+
+def pytest_sessionstart(session):
+    # The bot reads its prompts from ./src and writes logs and databases to the working directory.
+    # Changed once the test paths are resolved, before any test module imports the bot.
+    workdir = tempfile.mkdtemp(prefix="telegram_chatbot_tests_")
+    os.symlink(os.path.abspath(SRC_PATH), os.path.join(workdir, "src"))
+    os.chdir(workdir)
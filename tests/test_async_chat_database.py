@@ -0,0 +1,49 @@
+import asyncio
+import threading
+import time
+
+from databases import init_user_db, async_chat_database
+
+
+def _blocking_job(release: threading.Event):
+    release.wait(timeout=5)
+    return "done"
+
+
+def test_handlers_are_not_serialized_by_database_writes():
+    init_user_db()
+
+    async def scenario():
+        # Cache the history of a reader before the worker is blocked
+        await async_chat_database.save_message(2, "reader", "user", "hello")
+        assert await async_chat_database.load_recent_messages(2, "reader", 10)
+
+        release = threading.Event()
+        slow_job = asyncio.create_task(async_chat_database._run(_blocking_job, release))
+        write = asyncio.create_task(async_chat_database.save_message(1, "writer", "user", "pending"))
+        await asyncio.sleep(0.05)
+        assert not write.done()
+
+        async def handler(index: int) -> int:
+            await asyncio.sleep(0.01)
+            return index
+
+        # Other handlers and cache-served history reads finish while the write is pending
+        start = time.perf_counter()
+        results = await asyncio.wait_for(asyncio.gather(*(handler(i) for i in range(100))), timeout=1)
+        history = await asyncio.wait_for(async_chat_database.load_recent_messages(2, "reader", 10), timeout=1)
+        elapsed = time.perf_counter() - start
+
+        assert results == list(range(100))
+        assert [message[2] for message in history] == ["hello"]
+        assert elapsed < 0.5
+        assert not write.done()
+
+        release.set()
+        assert await slow_job == "done"
+        await write
+        history = await async_chat_database.load_recent_messages(1, "writer", 10)
+        assert [message[2] for message in history] == ["pending"]
+        await async_chat_database.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,59 @@
+import asyncio
+import sys
+from collections import deque
+from types import SimpleNamespace
+
+import pytest
+from telegram.error import BadRequest
+
+from commands import empty
+from databases import init_user_db, async_chat_database
+from tools import SendQueue
+
+
+class FakeBot:
+    def __init__(self, failing_batches: int):
+        self.failing_batches = failing_batches
+        self.sent = []
+
+    async def delete_messages(self, chat_id: int, message_ids: list[int]):
+        if self.failing_batches:
+            self.failing_batches -= 1
+            raise BadRequest("Message can't be deleted")
+        return True
+
+    async def send_message(self, chat_id: int, text: str, parse_mode: str = None, reply_markup=None):
+        self.sent.append(text)
+        return SimpleNamespace(message_id=10_000 + len(self.sent))
+
+
+@pytest.mark.parametrize("failing_batches, reply", [
+    (0, "Chat history has been cleared"),
+    (1, "but 100 of 150 messages could not be deleted"),
+    (2, "the messages in this chat could not be deleted"),
+])
+def test_empty_reports_failed_deletions(monkeypatch, failing_batches, reply):
+    init_user_db()
+    queue = SendQueue(global_rate=1000, chat_rate=1000, chat_burst=1000)
+    for module in ("commands.empty", "tools.send_message"):
+        monkeypatch.setattr(sys.modules[module], "send_queue", queue)
+
+    bot = FakeBot(failing_batches)
+    user = SimpleNamespace(id=1, username="user")
+    update = SimpleNamespace(
+        effective_user=user,
+        effective_chat=SimpleNamespace(id=1),
+        message=SimpleNamespace(message_id=150)
+    )
+    context = SimpleNamespace(bot=bot, chat_data={"message_ids": deque(range(1, 150))})
+
+    async def scenario():
+        try:
+            await empty(update, context)
+        finally:
+            await queue.close()
+            await async_chat_database.close()
+
+    asyncio.run(scenario())
+    assert len(bot.sent) == 1
+    assert reply in bot.sent[0].replace("\\", "")
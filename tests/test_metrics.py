@@ -0,0 +1,30 @@
+import asyncio
+import socket
+
+from tools import TTLCache, MetricsServer, metrics_registry, watch_cache
+
+
+def test_cache_counters_are_exported():
+    cache = TTLCache()
+    cache.set("seoul", 1)
+    cache.get("seoul")
+    cache.get("busan")
+    watch_cache("test_cache", cache.stats)
+
+    rendered = metrics_registry.render()
+    assert 'bot_cache_requests_total{cache="test_cache",result="hit"} 1' in rendered
+    assert 'bot_cache_requests_total{cache="test_cache",result="miss"} 1' in rendered
+    assert 'bot_cache_entries{cache="test_cache"} 1' in rendered
+
+
+def test_taken_port_does_not_stop_the_bot():
+    with socket.socket() as taken:
+        taken.bind(("127.0.0.1", 0))
+        taken.listen()
+        server = MetricsServer("127.0.0.1", taken.getsockname()[1])
+
+        async def scenario():
+            await server.start()
+            await server.stop()
+
+        asyncio.run(scenario())
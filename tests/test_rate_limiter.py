@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+import pytest
+
+from tools import RateLimiter, CircuitBreaker, CircuitOpenError
+
+
+class StatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def _limiter(breaker: CircuitBreaker) -> RateLimiter:
+    return RateLimiter(
+        requests_per_minute=100000,
+        tokens_per_minute=100000,
+        is_retryable=lambda e: getattr(e, "status_code", 0) >= 500 or getattr(e, "status_code", 0) == 429,
+        max_retries=0,
+        breaker=breaker
+    )
+
+
+def _open_breaker(limiter: RateLimiter):
+    async def fail():
+        raise StatusError(500)
+
+    with pytest.raises(StatusError):
+        asyncio.run(limiter.call(fail))
+    assert limiter.breaker.state == "open"
+    # Let the reset timeout pass
+    limiter.breaker._opened_at = time.monotonic() - limiter.breaker.reset_timeout
+    assert limiter.breaker.state == "half_open"
+
+
+async def _ok():
+    return "ok"
+
+
+@pytest.mark.parametrize("status_code", [400, 429])
+def test_trial_answered_with_error_closes_circuit(status_code):
+    limiter = _limiter(CircuitBreaker(failure_threshold=1, reset_timeout=30))
+    _open_breaker(limiter)
+
+    async def refuse():
+        raise StatusError(status_code)
+
+    with pytest.raises(StatusError):
+        asyncio.run(limiter.call(refuse))
+    assert limiter.breaker.state == "closed"
+    assert asyncio.run(limiter.call(_ok)) == "ok"
+
+
+def test_trial_failing_again_reopens_circuit():
+    limiter = _limiter(CircuitBreaker(failure_threshold=1, reset_timeout=30))
+    _open_breaker(limiter)
+
+    async def fail():
+        raise StatusError(503)
+
+    with pytest.raises(StatusError):
+        asyncio.run(limiter.call(fail))
+    assert limiter.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(limiter.call(_ok))
+
+
+def test_cancelled_trial_releases_circuit():
+    limiter = _limiter(CircuitBreaker(failure_threshold=1, reset_timeout=30))
+    _open_breaker(limiter)
+
+    async def cancel_trial():
+        task = asyncio.create_task(limiter.call(lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_trial())
+    assert limiter.breaker.state == "half_open"
+    assert asyncio.run(limiter.call(_ok)) == "ok"
+    assert limiter.breaker.state == "closed"
@@ -0,0 +1,18 @@
+from tools import ResponseCache
+
+
+def test_spelling_variants_share_an_entry():
+    cache = ResponseCache()
+    cache.set("ctx", "What is  SQLite?", "A database.")
+    assert cache.get("ctx", "what is sqlite") == "A database."
+    assert cache.get("ctx", "What is SQLite ?!") == "A database."
+
+
+def test_symbols_inside_the_question_are_kept():
+    cache = ResponseCache()
+    cache.set("ctx", "what is 2+2?", "4")
+    assert cache.get("ctx", "What is 2-2") is None
+    assert cache.get("ctx", "what is 2*2") is None
+
+    cache.set("ctx", "Is C++ faster than C#?", "It depends.")
+    assert cache.get("ctx", "is c faster than c") is None
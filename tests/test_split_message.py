@@ -0,0 +1,67 @@
+import random
+import re
+
+import pytest
+
+from tools import split_message, text2markdown
+
+MESSAGE_LIMIT = 4096
+
+_FENCE = re.compile(r"```[^\n`]*\n?")
+
+
+def _prose(paragraphs: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    words = ["latency", "cache", "(p95)", "v1.2", "a-b", "x=y", "[link]", "#tag", "path\\to", "*bold*", "50%!", "C++"]
+    text = []
+    for _ in range(paragraphs):
+        sentences = [" ".join(rng.choice(words) for _ in range(rng.randint(5, 25))) + "." for _ in range(rng.randint(1, 8))]
+        text.append(" ".join(sentences))
+    return "\n\n".join(text)
+
+
+def _code_block(lines: int) -> str:
+    body = "\n".join(f"value_{i} = compute(\"{i}\\n\", `{i}`)  # step {i}" for i in range(lines))
+    return f"```python\n{body}\n```"
+
+
+def _content(text: str) -> str:
+    # Fences are repeated in every chunk of a split code block, and whitespace at chunk edges is trimmed
+    return "".join(_FENCE.sub("", text).split())
+
+
+def _escapes_complete(rendered: str) -> bool:
+    position = 0
+    while position < len(rendered):
+        if rendered[position] == "\\":
+            if position + 1 == len(rendered):
+                return False
+            position += 1
+        position += 1
+    return True
+
+
+TEXTS = {
+    "prose": _prose(400),
+    "no spaces": "é.\\-!" * 6000,
+    "code block": _code_block(600),
+    "mixed": "\n\n".join([_prose(40, 1), _code_block(300), _prose(40, 2), _code_block(20), _prose(40, 3)]),
+}
+
+
+@pytest.mark.parametrize("name", TEXTS)
+def test_chunks_fit_and_keep_content(name):
+    text = TEXTS[name]
+    chunks = split_message(text)
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        rendered = text2markdown(chunk)
+        assert len(rendered) <= MESSAGE_LIMIT
+        assert chunk.count("```") % 2 == 0
+        assert _escapes_complete(rendered)
+    assert _content("".join(chunks)) == _content(text)
+
+
+def test_short_text_is_one_chunk():
+    assert split_message("Hello *world*!") == ["Hello *world*!"]
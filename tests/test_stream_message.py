@@ -0,0 +1,123 @@
+import asyncio
+import re
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+from telegram.error import BadRequest
+
+from tools import SendQueue, StreamingMessage, render_partial_markdown, text2markdown
+from commands import GPT_Agent
+
+ANSWER = "Use `a*b` and `c_d` in **bold** text.\n\n```python\nx = a * b\n```\nDone, see [docs](https://example.com)."
+
+
+def _valid_markdown(text: str) -> bool:
+    """
+    Roughly checks MarkdownV2 the way Telegram does: entities outside code must be balanced.
+    """
+    text = re.sub(r"\\.", "", text, flags=re.DOTALL)
+    if text.count("```") % 2:
+        return False
+    text = re.sub(r"```.*?```", "", text, flags=re.DOTALL)
+    text = re.sub(r"`[^`]*`", "", text)
+    return "`" not in text and text.count("*") % 2 == 0 and text.count("_") % 2 == 0
+
+
+class FakeMessage:
+    def __init__(self, bot: "FakeBot", message_id: int):
+        self.bot = bot
+        self.message_id = message_id
+
+    async def edit_text(self, text: str, parse_mode: str = None, reply_markup=None):
+        if parse_mode == "MarkdownV2" and not _valid_markdown(text):
+            raise BadRequest("Can't parse entities: unbalanced markup")
+        self.bot.calls.append((time.monotonic(), "edit", text, parse_mode))
+        return self
+
+    async def delete(self):
+        return True
+
+
+class FakeBot:
+    def __init__(self):
+        self.calls = []
+
+    async def send_message(self, chat_id: int, text: str, parse_mode: str = None, reply_markup=None):
+        self.calls.append((time.monotonic(), "send", text, parse_mode))
+        return FakeMessage(self, len(self.calls))
+
+
+class FakeStreamingClient:
+    """
+    Chat completions client whose streamed answer arrives in small chunks.
+    """
+
+    def __init__(self, text: str, chunk_size: int = 4, delay: float = 0.01):
+        self.text = text
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, **params):
+        assert params["stream"]
+        return self._chunks()
+
+    async def _chunks(self):
+        for start in range(0, len(self.text), self.chunk_size):
+            await asyncio.sleep(self.delay)
+            delta = SimpleNamespace(content=self.text[start:start + self.chunk_size])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("use `a*b` now", "use `a*b` now"),
+    ("**bold** and `c_d`", "**bold** and `c_d`"),
+    ("*bold `code", "*bold `code`*"),
+    ("_it `x*` y", "_it `x*` y_"),
+    ("```py\nx = 1", "```py\nx = 1\n```"),
+])
+def test_partial_markdown_closes_only_open_entities(text, expected):
+    assert render_partial_markdown(text) == expected
+
+
+def test_streamed_response_edits_at_the_edit_interval(monkeypatch):
+    queue = SendQueue(global_rate=1000, chat_rate=1000, chat_burst=1000)
+    # A queue without Telegram's per-chat pacing, so that only the edit interval limits edits
+    for module in ("tools.stream_message", "tools.send_message"):
+        monkeypatch.setattr(sys.modules[module], "send_queue", queue)
+
+    edit_interval = 0.1
+    bot = FakeBot()
+    client = FakeStreamingClient(ANSWER)
+
+    async def scenario():
+        agent = GPT_Agent(client=client)
+        update = SimpleNamespace(effective_chat=SimpleNamespace(id=1))
+        context = SimpleNamespace(bot=bot, chat_data={})
+        streamer = StreamingMessage(update, context, edit_interval=edit_interval)
+        start = time.monotonic()
+        try:
+            text = await agent._get_streamed_response("system", "question", streamer, user_id=1)
+        finally:
+            await agent.close()
+            await queue.close()
+        return text, time.monotonic() - start
+
+    text, elapsed = asyncio.run(scenario())
+    assert text == ANSWER
+
+    # The placeholder is sent once, then only edited
+    assert [call[1] for call in bot.calls].count("send") == 1
+    assert bot.calls[0][2] == "…"
+    edits = bot.calls[1:]
+
+    # Intermediate edits respect the edit interval, the last one shows the full text
+    assert 1 < len(edits) <= elapsed / edit_interval + 2
+    times = [call[0] for call in edits[:-1]]
+    assert all(later - earlier >= edit_interval * 0.9 for earlier, later in zip(times, times[1:]))
+    assert edits[-1][2] == text2markdown(ANSWER)
+
+    # Every draft was valid MarkdownV2, so no edit had to be repeated as plain text
+    assert all(call[3] == "MarkdownV2" for call in edits)
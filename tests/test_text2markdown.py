@@ -0,0 +1,18 @@
+from tools import text2markdown, render_partial_markdown
+
+
+def test_code_entities_are_kept():
+    assert text2markdown("Use `a.b()` here.") == "Use `a.b()` here\\."
+    assert text2markdown("```py\nx = 1\n```") == "```py\nx = 1\n```"
+
+
+def test_unmatched_backticks_are_escaped():
+    assert text2markdown("I can`t do it") == "I can\\`t do it"
+    assert text2markdown("```py\nx = 1") == "\\`\\`\\`py\nx \\= 1"
+    assert text2markdown("a ``` b `c` d.") == "a \\`\\`\\` b `c` d\\."
+
+
+def test_partial_text_keeps_open_entities_open():
+    assert text2markdown("I can`t", partial=True) == "I can`t"
+    assert render_partial_markdown("```py\nx = 1") == "```py\nx = 1\n```"
+    assert render_partial_markdown("see `code") == "see `code`"
@@ -0,0 +1,44 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from telegram import Bot
+
+from webhook_server import WebhookServer, SECRET_TOKEN_HEADER
+
+SECRET = "secret"
+
+
+class FakeRequest:
+    def __init__(self, body: str, token: str = SECRET):
+        self.body = body
+        self.headers = {SECRET_TOKEN_HEADER: token}
+        self.remote = "127.0.0.1"
+
+    async def json(self):
+        return json.loads(self.body)
+
+
+def _handle(body: str, token: str = SECRET):
+    async def scenario():
+        application = SimpleNamespace(bot=Bot("123456:TOKEN"), update_queue=asyncio.Queue())
+        server = WebhookServer(application, secret_token=SECRET)
+        server.ready = True
+        response = await server._handle_update(FakeRequest(body, token))
+        return response.status, application.update_queue.qsize()
+
+    return asyncio.run(scenario())
+
+
+def test_update_is_queued():
+    assert _handle(json.dumps({"update_id": 1})) == (200, 1)
+
+
+def test_wrong_secret_is_rejected():
+    assert _handle(json.dumps({"update_id": 1}), token="wrong") == (403, 0)
+
+
+@pytest.mark.parametrize("body", ["{", "[]", '"x"', "null", "1"])
+def test_malformed_update_is_rejected(body):
+    assert _handle(body) == (400, 0)